@@ -0,0 +1,22 @@
+"""
+Placeholder settings so benchmarks can import `src` without a real `.env`.
+Values already present in the environment (or `.env`) take precedence.
+"""
+
+import os
+
+_DEFAULTS = {
+    "APP_NAME": "Timber-GPT-bench",
+    "DATASET_PATH": "datasets/dataset1.txt",
+    "CHROMA_PERSIST_DIR": "chroma_db",
+    "JWT_SECRET_KEY": "bench_secret_key",
+    "SERVER_URL": "http://localhost:8000",
+    "FRONTEND_URL": "http://localhost:3000",
+    "DATABASE_URL": "sqlite://",
+    "OPEN_AI": "unused",
+    "GEMINI_API_KEY": "unused",
+    "ROBOFLOW_API_KEY": "unused",
+}
+
+for key, value in _DEFAULTS.items():
+    os.environ.setdefault(key, value)
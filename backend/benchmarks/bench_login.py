@@ -0,0 +1,217 @@
+"""
+Login throughput under concurrency, and what a login burst does to the
+rest of the API: the original sync route (bcrypt on anyio's shared thread
+pool) vs. the async route with bcrypt on the dedicated hashing pool.
+
+While the logins run, a cheap sync endpoint is polled; its latency is how
+long any other sync route waits for a thread. Also times `/user/me`-style
+token verification with and without the verified-token cache.
+
+A user seeded with a lower cost shows the rehash on login.
+
+Usage (from `backend/`):
+    uv run python -m benchmarks.bench_login --logins 200 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--logins", type=int, default=200)
+parser.add_argument("--concurrency", type=int, default=64)
+parser.add_argument("--rounds", type=int, default=12)
+parser.add_argument("--workers", type=int, default=2)
+parser.add_argument("--users", type=int, default=20)
+args = parser.parse_args()
+
+# Settings are read at import, so these go first
+_db = os.path.join(tempfile.mkdtemp(), "bench_login.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db}"
+os.environ["PASSWORD_HASH_ROUNDS"] = str(args.rounds)
+os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+
+from benchmarks import _env  # noqa: F401, E402
+from fastapi import Depends, FastAPI, HTTPException  # noqa: E402
+from fastapi.security import OAuth2PasswordRequestForm  # noqa: E402
+from passlib.context import CryptContext  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from src import models  # noqa: E402
+from src.core import get_session, init_db  # noqa: E402
+from src.core.db import engine  # noqa: E402
+from src.core.executors import get_hashing_pool  # noqa: E402
+from src.features.user.user_router import router as user_router  # noqa: E402
+from src.schemas import Token  # noqa: E402
+from src.security import hashing, oauth2  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def original_login(
+    session: Session = Depends(get_session),
+    form_data: OAuth2PasswordRequestForm = Depends(),
+):
+    """The route as it was: sync, bcrypt on the shared thread pool"""
+    statement = select(models.User).where(models.User.email == form_data.username)
+    user = session.exec(statement).first()
+    if not user or not hashing.verify(form_data.password, user.password):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    token = oauth2.create_access_token({"name": user.name, "email": user.email})
+    return Token(access_token=token, token_type="bearer")
+
+
+def ping():
+    """Stands in for every other sync endpoint"""
+    return {"ok": True}
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(user_router)
+    app.post("/original/login")(original_login)
+    app.get("/ping")(ping)
+    return app
+
+
+LEGACY_EMAIL = "legacy@example.com"
+
+
+def seed_users(count: int) -> list:
+    engine.echo = False
+    init_db()
+    seed_hash = hashing.hash(PASSWORD)
+    legacy_context = CryptContext(
+        schemes=["bcrypt"], bcrypt__rounds=max(4, args.rounds - 2)
+    )
+    emails = [f"user{i}@example.com" for i in range(count)]
+    with Session(engine) as session:
+        for email in emails:
+            session.add(models.User(name=email, email=email, password=seed_hash))
+        session.add(
+            models.User(
+                name="legacy",
+                email=LEGACY_EMAIL,
+                password=legacy_context.hash(PASSWORD),
+            )
+        )
+        session.commit()
+    return emails
+
+
+def legacy_cost() -> str:
+    with Session(engine) as session:
+        statement = select(models.User).where(models.User.email == LEGACY_EMAIL)
+        return session.exec(statement).one().password.split("$")[2]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def login_burst(client, path: str, emails: list):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, statuses = [], []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                path, data={"username": emails[i % len(emails)], "password": PASSWORD}
+            )
+            latencies.append(time.perf_counter() - started)
+            statuses.append(response.status_code)
+
+    ping_latencies = []
+    done = asyncio.Event()
+
+    async def poll():
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get("/ping")
+            ping_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+
+    poller = asyncio.create_task(poll())
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await poller
+    return elapsed, latencies, statuses, ping_latencies
+
+
+async def run_logins(app: FastAPI, emails: list):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        print(
+            f"{'route':<18}{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'ping p50':>10}{'ping p95':>10}{'ping max':>10}"
+        )
+        for name, path in (
+            ("original (sync)", "/original/login"),
+            ("hashing pool", "/user/login"),
+        ):
+            elapsed, latencies, statuses, pings = await login_burst(
+                client, path, emails
+            )
+            if set(statuses) != {200}:
+                raise SystemExit(f"{name}: unexpected statuses {set(statuses)}")
+            print(
+                f"{name:<18}{args.logins / elapsed:10.1f}"
+                f"{percentile(latencies, 0.5) * 1e3:9.0f}"
+                f"{percentile(latencies, 0.95) * 1e3:9.0f}"
+                f"{statistics.median(pings) * 1e3:10.1f}"
+                f"{percentile(pings, 0.95) * 1e3:10.1f}"
+                f"{max(pings) * 1e3:10.1f}"
+            )
+
+        cost = legacy_cost()
+        await client.post(
+            "/user/login", data={"username": LEGACY_EMAIL, "password": PASSWORD}
+        )
+        print(f"rehash on login: cost {cost} -> {legacy_cost()}")
+
+
+def time_token_checks(runs: int = 20000):
+    token = oauth2.create_access_token({"name": "bench", "email": "bench@example.com"})
+    cache = oauth2.token_cache
+
+    oauth2.token_cache = None
+    started = time.perf_counter()
+    for _ in range(runs):
+        oauth2.verify_access_token(token)
+    uncached = (time.perf_counter() - started) / runs
+
+    oauth2.token_cache = cache or oauth2.TokenCache(1024)
+    oauth2.verify_access_token(token)  # fill
+    started = time.perf_counter()
+    for _ in range(runs):
+        oauth2.verify_access_token(token)
+    cached = (time.perf_counter() - started) / runs
+    oauth2.token_cache = cache
+
+    print(f"token check: {uncached * 1e6:.1f} us decoded, {cached * 1e6:.1f} us cached")
+
+
+def main():
+    print(
+        f"{args.logins} logins, {args.concurrency} concurrent, bcrypt cost "
+        f"{args.rounds}, {args.workers} hashing workers, {os.cpu_count()} CPUs"
+    )
+    emails = seed_users(args.users)
+    asyncio.run(run_logins(build_app(), emails))
+    print(f"hashing pool: {get_hashing_pool().stats()}")
+    time_token_checks()
+
+
+if __name__ == "__main__":
+    main()
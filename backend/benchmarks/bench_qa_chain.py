@@ -0,0 +1,105 @@
+"""
+Per-request overhead of the chat path: rebuilding `ConversationalRetrievalChain`
+on every call (old behaviour) vs. reusing the startup chain and passing the
+session history in per call.
+
+A fake chat model and a static retriever are used so only the LangChain
+overhead is measured, not Gemini or Chroma latency.
+
+Usage (from `backend/`):
+    uv run python -m benchmarks.bench_qa_chain --requests 500
+"""
+
+import argparse
+import time
+from typing import List
+
+from benchmarks import _env  # noqa: F401
+from langchain.chains import ConversationalRetrievalChain
+from langchain.memory import ConversationBufferWindowMemory
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.retrievers import BaseRetriever
+
+from src.features.gpt.gpt_prompts import QA_PROMPT
+
+
+class StaticRetriever(BaseRetriever):
+    docs: List[Document]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.docs
+
+
+def _new_memory() -> ConversationBufferWindowMemory:
+    return ConversationBufferWindowMemory(
+        k=5, return_messages=True, memory_key="chat_history", output_key="answer"
+    )
+
+
+def _build_chain(llm, retriever, memory=None) -> ConversationalRetrievalChain:
+    return ConversationalRetrievalChain.from_llm(
+        llm=llm,
+        retriever=retriever,
+        memory=memory,
+        return_source_documents=True,
+        combine_docs_chain_kwargs={"prompt": QA_PROMPT},
+        verbose=False,
+    )
+
+
+def bench_rebuild(llm, retriever, n: int) -> float:
+    memory = _new_memory()
+    start = time.perf_counter()
+    for i in range(n):
+        chain = _build_chain(llm, retriever, memory=memory)
+        chain({"question": f"What is the price of teak? ({i})"})
+    return time.perf_counter() - start
+
+
+def bench_reuse(llm, retriever, n: int) -> float:
+    memory = _new_memory()
+    chain = _build_chain(llm, retriever)
+    start = time.perf_counter()
+    for i in range(n):
+        question = f"What is the price of teak? ({i})"
+        chat_history = memory.load_memory_variables({})["chat_history"]
+        result = chain.invoke({"question": question, "chat_history": chat_history})
+        memory.save_context({"question": question}, {"answer": result["answer"]})
+    return time.perf_counter() - start
+
+
+def bench_build_only(llm, retriever, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        _build_chain(llm, retriever, memory=_new_memory())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    llm = FakeListChatModel(responses=["Teak is a premium hardwood."])
+    retriever = StaticRetriever(
+        docs=[Document(page_content="Teak sells by the cubic foot.")] * 8
+    )
+
+    n = args.requests
+    build = bench_build_only(llm, retriever, n)
+    rebuild = bench_rebuild(llm, retriever, n)
+    reuse = bench_reuse(llm, retriever, n)
+
+    print(f"requests: {n}")
+    print(f"chain construction only : {build / n * 1e3:8.3f} ms/request")
+    print(f"rebuild per request     : {rebuild / n * 1e3:8.3f} ms/request")
+    print(f"reuse startup chain     : {reuse / n * 1e3:8.3f} ms/request")
+    print(f"saved per request       : {(rebuild - reuse) / n * 1e3:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
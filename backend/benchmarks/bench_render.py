@@ -0,0 +1,95 @@
+"""
+Cost of the /analyze visualization: the Matplotlib figure (original path)
+vs. compositing the panels with NumPy/OpenCV and encoding via `cv2.imencode`.
+
+A synthetic image with polygon predictions stands in for a real upload and
+Roboflow's responses, so only masks, rendering and encoding are measured.
+
+Usage (from `backend/`):
+    uv run python -m benchmarks.bench_render --runs 20 --size 1920x1080
+    uv run python -m benchmarks.bench_render --out /tmp/render  # keep outputs
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks import _env  # noqa: F401
+from src.features.image_process.defect_core import render_defect_analysis
+
+
+def _polygon(cx: float, cy: float, radius: float, n: int = 24) -> dict:
+    angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    return {
+        "points": [
+            {"x": float(cx + radius * np.cos(a)), "y": float(cy + radius * np.sin(a))}
+            for a in angles
+        ]
+    }
+
+
+def synthetic_inputs(width: int, height: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    image = rng.integers(60, 200, size=(height, width, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (0, 0), 5)
+    log = {
+        "predictions": [_polygon(width / 2, height / 2, min(width, height) * 0.45, 64)]
+    }
+    defects = {
+        "predictions": [
+            _polygon(
+                width / 2 + rng.uniform(-0.25, 0.25) * width,
+                height / 2 + rng.uniform(-0.25, 0.25) * height,
+                min(width, height) * rng.uniform(0.02, 0.06),
+            )
+            for _ in range(12)
+        ]
+    }
+    return image, log, defects
+
+
+def bench(image, log, defects, renderer: str, fmt: str, quality: int, runs: int):
+    render_defect_analysis(image, log, defects, renderer, fmt, quality)  # warm-up
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = render_defect_analysis(image, log, defects, renderer, fmt, quality)
+    elapsed = (time.perf_counter() - start) / runs
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--size", default="1920x1080", help="WIDTHxHEIGHT")
+    parser.add_argument("--quality", type=int, default=90)
+    parser.add_argument("--out", help="Directory to write the rendered images to")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    image, log, defects = synthetic_inputs(width, height)
+
+    print(f"image: {width}x{height}, runs: {args.runs}")
+    print(f"{'renderer':<12}{'format':<8}{'ms/image':>10}{'render ms':>11}{'KiB':>9}")
+    for renderer in ("matplotlib", "fast"):
+        for fmt in ("png", "jpeg"):
+            elapsed, result = bench(
+                image, log, defects, renderer, fmt, args.quality, args.runs
+            )
+            encoded, _ = result["images"]["image_blob"]
+            size = len(encoded) / 1024
+            print(
+                f"{renderer:<12}{fmt:<8}{elapsed * 1e3:10.1f}"
+                f"{result['timings_ms']['render']:11.1f}{size:9.0f}"
+            )
+            if args.out:
+                os.makedirs(args.out, exist_ok=True)
+                path = os.path.join(args.out, f"{renderer}.{fmt}")
+                with open(path, "wb") as f:
+                    f.write(encoded)
+
+
+if __name__ == "__main__":
+    main()
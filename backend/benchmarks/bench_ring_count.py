@@ -0,0 +1,86 @@
+"""
+Ring counting on the polar edge image: the original loop of
+`scipy.signal.find_peaks` over 20 scan lines vs. the vectorized
+run-length engine at 20 rays, 360 rays and every angular row.
+
+A synthetic cross-section with concentric, slightly jittered rings stands
+in for a real photo; the pith is its center.
+
+Usage (from `backend/`):
+    uv run python -m benchmarks.bench_ring_count --runs 50 --size 4000x3000
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+from scipy.signal import find_peaks
+
+from benchmarks import _env  # noqa: F401
+from src.features.image_process.ring_count_core import (
+    cartesian_to_polar,
+    consensus_count,
+    count_rings,
+    enhance_rings,
+)
+
+
+def scanline_counts(polar_edges, lines: int = 20):
+    """The original implementation"""
+    height = polar_edges.shape[0]
+    line_counts = []
+    for y in np.linspace(0, height - 1, lines, dtype=int):
+        binary_line = (polar_edges[y, :] > 0).astype(np.uint8)
+        peaks, _ = find_peaks(binary_line, distance=5)
+        line_counts.append(len(peaks))
+    return line_counts
+
+
+def synthetic_polar_edges(width: int, height: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width), 150, np.uint8)
+    center = (width // 2, height // 2)
+    for radius in range(40, min(width, height) // 2, 30):
+        jitter = int(rng.integers(-3, 4))
+        cv2.circle(img, center, radius + jitter, 60, 4)
+    img = cv2.add(img, rng.integers(0, 40, img.shape, dtype=np.uint8))
+    return cartesian_to_polar(enhance_rings(img), center)
+
+
+def timed(fn, runs: int):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = fn()
+    return (time.perf_counter() - start) / runs, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--size", default="4000x3000", help="WIDTHxHEIGHT")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    polar = synthetic_polar_edges(width, height)
+    print(f"polar edge image: {polar.shape[0]} angles x {polar.shape[1]} radii")
+    print(f"{'method':<28}{'rays':>6}{'ms':>9}{'median':>8}{'spread':>8}")
+
+    elapsed, counts = timed(lambda: scanline_counts(polar), args.runs)
+    print(
+        f"{'find_peaks loop (original)':<28}{len(counts):6d}{elapsed * 1e3:9.3f}"
+        f"{np.median(counts):8.1f}{np.ptp(counts):8d}"
+    )
+    for rays in (20, 360, 0):
+        elapsed, (indices, counts, _) = timed(
+            lambda: count_rings(polar, rays), args.runs
+        )
+        print(
+            f"{'vectorized run-length':<28}{len(indices):6d}{elapsed * 1e3:9.3f}"
+            f"{consensus_count(counts):8d}{np.ptp(counts):8d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
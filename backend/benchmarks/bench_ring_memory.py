@@ -0,0 +1,104 @@
+"""
+Time and peak memory of the ring enhancement on a large scan: the original
+chain of full-size intermediates vs. the folded lookup table on the whole
+image vs. bands processed in place.
+
+Each variant runs in a fresh process so its peak RSS is not hidden by an
+earlier one; the peak increase is measured from after the synthetic scan
+exists.
+
+Usage (from `backend/`):
+    uv run python -m benchmarks.bench_ring_memory --size 8000x5000 --band-rows 256
+"""
+
+import argparse
+import multiprocessing
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks import _env  # noqa: F401
+
+
+def original_enhance(img):
+    """The chain as it was, one full-size array per step"""
+    inverted = 255 - img
+    gamma = 2.5
+    inv_gamma = 1.0 / gamma
+    lut = np.array([((i / 255.0) ** inv_gamma) * 255 for i in range(256)]).astype(
+        "uint8"
+    )
+    boosted = cv2.LUT(inverted, lut)
+    contrast_enhanced = 255 - boosted
+    contrast_enhanced = cv2.convertScaleAbs(contrast_enhanced, alpha=1.2, beta=-20)
+    white_boosted = cv2.convertScaleAbs(contrast_enhanced, alpha=1.3, beta=20)
+    blur_for_sharp = cv2.GaussianBlur(white_boosted, (7, 7), 10)
+    highlighted = cv2.addWeighted(white_boosted, 1.5, blur_for_sharp, -0.5, 0)
+    blurred = cv2.GaussianBlur(highlighted, (3, 3), 1)
+    return cv2.Canny(blurred, 50, 150)
+
+
+def synthetic_scan(width: int, height: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    img = np.full((height, width), 150, np.uint8)
+    center = (width // 2, height // 2)
+    for radius in range(40, min(width, height) // 2, 30):
+        cv2.circle(img, center, radius + int(rng.integers(-3, 4)), 60, 4)
+    noise = rng.integers(0, 40, img.shape, dtype=np.uint8)
+    return cv2.add(img, noise, dst=img)
+
+
+def run_variant(variant: str, width: int, height: int, band_rows: int, queue):
+    from src.features.image_process.memory import PeakRSS
+    from src.features.image_process.ring_count_core import enhance_rings
+
+    img = synthetic_scan(width, height)
+    reference = None
+    if variant != "original":
+        # Checked before measuring: same edges as the original chain
+        reference = original_enhance(img)
+
+    memory = PeakRSS(1.0)
+    started = time.perf_counter()
+    if variant == "original":
+        edges = original_enhance(img)
+    elif variant == "lut, whole image":
+        edges = enhance_rings(img)
+    else:
+        edges = enhance_rings(img, band_rows, overwrite=True)
+    elapsed = time.perf_counter() - started
+    usage = memory.stop()
+
+    identical = None if reference is None else bool(np.array_equal(edges, reference))
+    queue.put((elapsed, usage["peak_increase"], identical))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", default="8000x5000", help="WIDTHxHEIGHT")
+    parser.add_argument("--band-rows", type=int, default=256)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    print(f"scan: {width}x{height} ({width * height / 1e6:.0f} MP, grayscale)")
+    print(f"{'variant':<22}{'ms':>9}{'peak +MiB':>11}{'identical':>11}")
+
+    ctx = multiprocessing.get_context("spawn")
+    for variant in ("original", "lut, whole image", "banded, in place"):
+        queue = ctx.Queue()
+        proc = ctx.Process(
+            target=run_variant,
+            args=(variant, width, height, args.band_rows, queue),
+        )
+        proc.start()
+        elapsed, peak, identical = queue.get()
+        proc.join()
+        print(
+            f"{variant:<22}{elapsed * 1e3:9.0f}{peak:11.1f}"
+            f"{'-' if identical is None else str(identical):>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
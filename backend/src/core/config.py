@@ -11,17 +11,100 @@ class Settings(BaseSettings):
     chunk_size: int = 800
     chunk_overlap: int = 150
     retrieval_doc_k: int = 8
+    retrieval_hybrid: bool = True
+    retrieval_max_docs: int = 4
+    retrieval_token_budget: int = 1500
     memory_window_k: int = 5
+    condense_skip_enabled: bool = True
     embedding_model: str = "models/embedding-001"
     llm_model: str = "gemini-1.5-flash"
     llm_temperature: float = 0.0
-    dataset_path: str
+    dataset_path: str  # A single file or a directory of .txt/.md files
     chroma_persist_dir: str
+    ingest_batch_size: int = 64
+    ingest_concurrency: int = 4
+    embedding_cache_path: str = "embedding_cache.sqlite3"  # "" disables
+    embedding_cache_max_queries: int = 100000
+    index_startup_mode: str = "background"  # "blocking", "background" or "off"
+
+    # ========= LLM limits =========
+    llm_max_concurrency: int = 8
+    llm_max_queue: int = 32
+
+    # ======= Session memory =======
+    session_store: str = "memory"  # "memory" or "db"
+    session_max_sessions: int = 10000
+    session_max_chars: int = 8000
+    session_max_total_chars: int = 50_000_000
+    session_idle_ttl_seconds: int = 86400
+    session_cache_seconds: float = 5.0
+
+    # ======== Answer cache ========
+    answer_cache_enabled: bool = True
+    answer_cache_max_entries: int = 1024
+    answer_cache_ttl_seconds: int = 3600
+    answer_cache_semantic: bool = False
+    answer_cache_similarity: float = 0.95
+
+    # ========== Roboflow ==========
+    roboflow_timeout_seconds: float = 30.0
+    roboflow_connect_timeout_seconds: float = 5.0
+    roboflow_max_connections: int = 20
+    roboflow_max_keepalive: int = 10
+    roboflow_keepalive_expiry: float = 30.0
+    roboflow_http2: bool = False
+    roboflow_max_retries: int = 2
+    roboflow_backoff_seconds: float = 0.5
+    roboflow_max_backoff_seconds: float = 10.0  # cap on any wait, Retry-After too
+    roboflow_upload_max_side: int = 1280  # downscale uploads to this, 0 sends originals
+    roboflow_upload_quality: int = 90
+    inference_backend: str = "roboflow"  # "roboflow" or "onnx" (local CPU)
+    inference_cache_enabled: bool = True
+    inference_cache_max_entries: int = 1000  # memory tier
+    inference_cache_path: str = "inference_cache.sqlite3"  # disk tier, "" disables
+    inference_cache_max_disk_entries: int = 50000
+    inference_cache_ttl_seconds: float = 7 * 24 * 3600
+
+    # ===== Local ONNX inference ====
+    onnx_model_dir: str = "models"  # <dir>/<model id>.onnx, e.g. models/wood_segment/17.onnx
+    onnx_threads: int = 0  # intra-op threads per session, 0 = onnxruntime default
+    onnx_workers: int = 1  # session runs in parallel
+    onnx_max_batch: int = 4  # images per run, for exports with a dynamic batch axis
+    onnx_batch_wait_ms: float = 5.0
+    onnx_confidence: float = 0.4
+    onnx_iou: float = 0.3
+
+    # ======= Image pipelines ======
+    image_executor: str = "thread"  # "thread" or "process"
+    image_workers: int = 4
+    image_renderer: str = "fast"  # "fast" (OpenCV) or "matplotlib"
+    ring_count_rays: int = 360  # rays of the polar image counted, 0 = every row
+    ring_band_rows: int = 256  # enhancement band height, 0 = whole image at once
+    ring_max_working_bytes: int = 256 * 1024 * 1024  # per ring count, else 413; 0 = off
+    memory_sample_interval_ms: float = 5.0  # per-request peak RSS sampling, 0 = off
+    image_max_bytes: int = 64 * 1024 * 1024  # per uploaded image, else 413
+    image_max_pixels: int = 100_000_000  # width x height from the header, else 413
+    artifact_dir: str = "artifacts"
+    artifact_ttl_seconds: float = 600.0
+    batch_concurrency: int = 4  # images in flight per batch request
+    batch_max_files: int = 500
+    batch_max_file_bytes: int = 25 * 1024 * 1024
+    batch_max_request_bytes: int = 1024 * 1024 * 1024
+    job_workers: int = 2
+    job_max_queue: int = 100
+    job_ttl_seconds: float = 3600.0
+    job_callback_timeout_seconds: float = 10.0
+    job_callback_allowed_hosts: str = ""  # comma-separated; "" = any public host
+    job_max_queued_bytes: int = 512 * 1024 * 1024  # images waiting in the queue
 
     # ======== JWT Settings ========
     jwt_secret_key: str
     jwt_algorithm: str = "HS256"
     jwt_expiration_minutes: int = 60
+    password_hash_rounds: int = 12  # bcrypt cost; other hashes are redone on login
+    password_hash_workers: int = 2  # threads of the dedicated hashing pool
+    token_cache_max_entries: int = 1024  # verified tokens kept until expiry, 0 = off
+    admin_emails: str = ""  # comma-separated; "" = no admin endpoints over HTTP
 
     # ============ URLs ============
     server_url: str
@@ -0,0 +1,101 @@
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from .config import settings
+
+
+class WorkerPool:
+    """
+    Runs blocking, CPU-bound work off the event loop, either on threads
+    (enough for OpenCV/NumPy, which release the GIL) or on processes (for
+    pure-Python or Matplotlib-heavy work). Tracks queue depth.
+    In process mode arguments and results are pickled, so large arrays are
+    copied between processes.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int):
+        if kind == "thread":
+            executor: Executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix=name
+            )
+        elif kind == "process":
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            raise ValueError(f"Unknown executor kind '{kind}'")
+
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self._executor = executor
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` on the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            result = await loop.run_in_executor(
+                self._executor, functools.partial(fn, *args, **kwargs)
+            )
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "running": min(self.pending, self.max_workers),
+            "queued": max(0, self.pending - self.max_workers),
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pools: Dict[str, WorkerPool] = {}
+
+
+def get_image_pool() -> WorkerPool:
+    """Pool for the image pipelines, sized by `image_executor`/`image_workers`"""
+    if "image" not in _pools:
+        _pools["image"] = WorkerPool(
+            "image", settings.image_executor, settings.image_workers
+        )
+    return _pools["image"]
+
+
+def get_hashing_pool() -> WorkerPool:
+    """
+    Pool for password hashing, sized by `password_hash_workers`. bcrypt
+    releases the GIL, and a login burst queues here instead of taking the
+    threads every sync endpoint shares.
+    """
+    if "hashing" not in _pools:
+        _pools["hashing"] = WorkerPool(
+            "hashing", "thread", settings.password_hash_workers
+        )
+    return _pools["hashing"]
+
+
+def shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown()
+    _pools.clear()
@@ -0,0 +1,180 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace"""
+    question = _PUNCTUATION.sub(" ", question.lower())
+    return _WHITESPACE.sub(" ", question).strip()
+
+
+def document_id(doc: Document) -> str:
+    """Stable ID of a retrieved chunk (vector store ID, else a content hash)"""
+    doc_id = getattr(doc, "id", None) or doc.metadata.get("chunk_id")
+    if doc_id:
+        return str(doc_id)
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class _CacheEntry:
+    question: str
+    answer: str
+    source_documents: List[Document]
+    expires_at: float
+    vector: Optional[np.ndarray] = None
+
+
+class AnswerCache:
+    """
+    LRU + TTL cache of chatbot answers.
+
+    Entries are keyed on the normalized question plus the IDs of the chunks
+    retrieved for it, so an answer is only reused when it would be generated
+    from the same context. With `semantic=True`, a question that misses the
+    exact key can still hit an entry retrieved from the same chunks whose
+    question embedding has cosine similarity >= `similarity_threshold`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        semantic: bool = False,
+        similarity_threshold: float = 0.95,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self.embeddings = None
+
+        self._entries: "OrderedDict[Tuple[str, Tuple[str, ...]], _CacheEntry]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def embed(self, question: str) -> Optional[np.ndarray]:
+        """Question embedding for semantic matching (None when disabled)"""
+        if not (self.semantic and self.embeddings):
+            return None
+        return self._unit(self.embeddings.embed_query(question))
+
+    async def aembed(self, question: str) -> Optional[np.ndarray]:
+        if not (self.semantic and self.embeddings):
+            return None
+        return self._unit(await self.embeddings.aembed_query(question))
+
+    def get(
+        self,
+        question: str,
+        docs: List[Document],
+        vector: Optional[np.ndarray] = None,
+    ) -> Optional[dict]:
+        """Cached result for `question` answered from `docs`, if any"""
+        doc_ids = tuple(document_id(doc) for doc in docs)
+        key = (normalize_question(question), doc_ids)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+
+            if entry is None and vector is not None:
+                entry = self._closest(doc_ids, vector, now)
+                if entry is not None:
+                    self.semantic_hits += 1
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end((normalize_question(entry.question), doc_ids))
+
+        return {
+            "question": question,
+            "answer": entry.answer,
+            "source_documents": list(entry.source_documents),
+            "cached": True,
+        }
+
+    def put(
+        self,
+        question: str,
+        docs: List[Document],
+        result: dict,
+        vector: Optional[np.ndarray] = None,
+    ):
+        """Store the answer produced for `question` from `docs`"""
+        key = (normalize_question(question), tuple(document_id(doc) for doc in docs))
+        entry = _CacheEntry(
+            question=question,
+            answer=result["answer"],
+            source_documents=list(result.get("source_documents") or docs),
+            expires_at=time.monotonic() + self.ttl_seconds,
+            vector=vector,
+        )
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after the vector store was rebuilt"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _closest(
+        self, doc_ids: Tuple[str, ...], vector: np.ndarray, now: float
+    ) -> Optional[_CacheEntry]:
+        best, best_score = None, self.similarity_threshold
+        for (_, ids), entry in self._entries.items():
+            if ids != doc_ids or entry.vector is None or entry.expires_at <= now:
+                continue
+            score = float(np.dot(entry.vector, vector))
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(arr)
+        return arr / norm if norm else arr
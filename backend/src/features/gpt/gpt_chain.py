@@ -0,0 +1,199 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.base import Chain
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForChainRun,
+    CallbackManagerForChainRun,
+)
+from langchain_core.documents import Document
+
+# Optional chain input carrying documents that were already retrieved for
+# the question, so the chain does not hit the retriever a second time
+RETRIEVED_DOCS_KEY = "retrieved_documents"
+
+# Messages the prompt answers without context (see the rules in gpt_prompts)
+_SMALL_TALK = re.compile(
+    r"^(hi+|hello+|hey+|hiya|yo|salam|assalamu? ?alaikum|good (morning|afternoon|"
+    r"evening|night)|thanks?( you)?( so much| a lot)?|thank you( so much| a lot)?|"
+    r"ok(ay)?|cool|great|nice|bye|goodbye|see you|how are you( doing)?)"
+    r"( there| all| everyone| friend)?$"
+)
+# Bare introductions only: a name of up to three words after "my name is",
+# one or two after "i am"; anything longer is likely a real request
+_NAME_WORD = r"[a-z][a-z'-]*"
+_INTRODUCTION = re.compile(
+    rf"^(?P<lead>my name is|i am|i'm|im) (?P<name>{_NAME_WORD}( {_NAME_WORD}){{0,2}})$"
+)
+_QUESTION_WORD = re.compile(
+    r"\b(what|which|who|whom|whose|why|how|when|where|can|could|should|would|"
+    r"is|are|do|does|need|want|looking|help|tell|recommend|best|price|cost)\b"
+)
+
+# Timber species, products, places and rules from the dataset: a question
+# naming one of these can be retrieved without the earlier turns
+_DOMAIN_ENTITY = re.compile(
+    r"\b(teak|garjan|mahogany|gamar|chapalish|sundari|bamboo|rubber ?wood|sal|"
+    r"oak|pine|spruce|fir|cedar|walnut|maple|birch|beech|ash|rosewood|ebony|"
+    r"eucalyptus|acacia|mango|jackfruit|rain ?tree|plywood|particleboard|mdf|"
+    r"veneer|glulam|hardwoods?|softwoods?|sundarbans|hill tracts|bfri|fsc|"
+    r"forest act|forest department|kiln|sawmills?|seasoning)\b"
+)
+
+# Words that only make sense with the earlier turns in view
+_REFERENCE = re.compile(
+    r"\b(it|its|they|them|their|theirs|this|that|these|those|he|she|him|her|"
+    r"there|same|above|previous|former|latter|ones?|also|too|else|more|another|"
+    r"other|others|again|instead)\b"
+)
+_FOLLOW_UP_START = re.compile(
+    r"^(and|but|so|or|what about|how about|why|why not|which|compared)\b"
+)
+_NON_WORD = re.compile(r"[^\w\s'.-]")
+
+
+def _clean(question: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", question.lower()).split()).strip(" .")
+
+
+def is_small_talk(question: str) -> bool:
+    """Greetings, thanks and self-introductions: no retrieval needed"""
+    # Checked before cleaning, which drops the "?"
+    if "?" in question:
+        return False
+    text = _clean(question)
+    if _SMALL_TALK.match(text):
+        return True
+    intro = _INTRODUCTION.match(text)
+    if intro is None or _QUESTION_WORD.search(intro["name"]):
+        return False
+    max_words = 3 if intro["lead"] == "my name is" else 2
+    return len(intro["name"].split()) <= max_words
+
+
+def needs_condensing(question: str) -> bool:
+    """
+    Whether a follow-up must be rewritten with the history before retrieval.
+    Condensing is the default; only small talk and questions that name a
+    domain entity themselves (several words, no references back to earlier
+    turns) are used verbatim.
+    """
+    if is_small_talk(question):
+        return False
+    text = _clean(question)
+    if len(text.split()) < 4:
+        return True
+    if _FOLLOW_UP_START.match(text) or _REFERENCE.search(text):
+        return True
+    return not _DOMAIN_ENTITY.search(text)
+
+
+class RoutingStats:
+    """How often the condense and retrieval steps were skipped"""
+
+    def __init__(self):
+        self.first_turns = 0
+        self.condense_calls = 0
+        self.condense_skipped = 0
+        self.retrieval_skipped = 0
+
+    def as_dict(self) -> Dict:
+        turns = self.first_turns + self.condense_calls + self.condense_skipped
+        skipped = self.first_turns + self.condense_skipped
+        return {
+            "first_turns": self.first_turns,
+            "condense_calls": self.condense_calls,
+            "condense_skipped": self.condense_skipped,
+            "condense_skip_rate": round(skipped / turns, 4) if turns else 0.0,
+            "retrieval_skipped": self.retrieval_skipped,
+        }
+
+
+class CondenseQuestionGate(Chain):
+    """
+    Stands in for the question generator of ConversationalRetrievalChain and
+    only calls the wrapped LLM chain when `needs_condensing` says so.
+    """
+
+    condense_chain: Chain
+    stats: Any
+
+    @property
+    def input_keys(self) -> List[str]:
+        return ["question", "chat_history"]
+
+    @property
+    def output_keys(self) -> List[str]:
+        return ["text"]
+
+    def _call(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, str]:
+        if not needs_condensing(inputs["question"]):
+            self.stats.condense_skipped += 1
+            return {"text": inputs["question"]}
+
+        self.stats.condense_calls += 1
+        callbacks = run_manager.get_child() if run_manager else None
+        result = self.condense_chain.invoke(inputs, config={"callbacks": callbacks})
+        return {"text": result[self.condense_chain.output_keys[0]]}
+
+    async def _acall(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[AsyncCallbackManagerForChainRun] = None,
+    ) -> Dict[str, str]:
+        if not needs_condensing(inputs["question"]):
+            self.stats.condense_skipped += 1
+            return {"text": inputs["question"]}
+
+        self.stats.condense_calls += 1
+        callbacks = run_manager.get_child() if run_manager else None
+        result = await self.condense_chain.ainvoke(
+            inputs, config={"callbacks": callbacks}
+        )
+        return {"text": result[self.condense_chain.output_keys[0]]}
+
+
+class TimberQAChain(ConversationalRetrievalChain):
+    """
+    ConversationalRetrievalChain that can reuse pre-retrieved documents and
+    skips retrieval for small talk
+    """
+
+    routing_stats: Optional[Any] = None
+
+    def _get_docs(
+        self,
+        question: str,
+        inputs: Dict[str, Any],
+        *,
+        run_manager: CallbackManagerForChainRun,
+    ) -> List[Document]:
+        if inputs.get(RETRIEVED_DOCS_KEY) is not None:
+            return self._reduce_tokens_below_limit(inputs[RETRIEVED_DOCS_KEY])
+        if self._skip_retrieval(question):
+            return []
+        return super()._get_docs(question, inputs, run_manager=run_manager)
+
+    async def _aget_docs(
+        self,
+        question: str,
+        inputs: Dict[str, Any],
+        *,
+        run_manager: AsyncCallbackManagerForChainRun,
+    ) -> List[Document]:
+        if inputs.get(RETRIEVED_DOCS_KEY) is not None:
+            return self._reduce_tokens_below_limit(inputs[RETRIEVED_DOCS_KEY])
+        if self._skip_retrieval(question):
+            return []
+        return await super()._aget_docs(question, inputs, run_manager=run_manager)
+
+    def _skip_retrieval(self, question: str) -> bool:
+        if self.routing_stats is None or not is_small_talk(question):
+            return False
+        self.routing_stats.retrieval_skipped += 1
+        return True
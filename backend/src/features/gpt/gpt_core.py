@@ -1,28 +1,75 @@
+import asyncio
+import logging
 import os
-from pathlib import Path
 from typing import Optional
 from dotenv import load_dotenv
-from typing import Dict
-from langchain.document_loaders import TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import AsyncIterator, List, Tuple
 from langchain.vectorstores import Chroma
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import ChatGoogleGenerativeAI
 
 from src.core import settings
+from src.core.concurrency import ConcurrencyLimiter
+from .gpt_cache import AnswerCache
+from .gpt_chain import (
+    RETRIEVED_DOCS_KEY,
+    CondenseQuestionGate,
+    RoutingStats,
+    TimberQAChain,
+    is_small_talk,
+)
+from .gpt_embeddings import create_embeddings
+from .gpt_ingest import (
+    IngestionPipeline,
+    IngestStats,
+    load_vector_store,
+    read_index_version,
+)
+from .gpt_memory import MemoryManager
 from .gpt_prompts import QA_PROMPT
+from .gpt_retriever import BM25Index, HybridRetriever
+
+# Tag of the answer-generating LLM call, used to pick its tokens out of the
+# chain's event stream (the question-condensing call is not streamed)
+ANSWER_LLM_TAG = "timber_answer"
+
+logger = logging.getLogger(__name__)
+
+
+class ChatbotNotReadyError(Exception):
+    """Raised when a question arrives before the index is available"""
 
 
 class ChatbotManager:
     """Main chatbot manager class"""
 
     def __init__(self):
-        self.qa_chain: Optional[ConversationalRetrievalChain] = None
+        self.qa_chain: Optional[TimberQAChain] = None
         self.memory_manager = MemoryManager()
         self.vectordb: Optional[Chroma] = None
+        self.embeddings: Optional[Embeddings] = None
+        self._ingest_lock = asyncio.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+        self.ready = False
+        self.index_version: Optional[str] = None
+        self.last_ingest: Optional[dict] = None
+        self.index_error: Optional[str] = None
         self.llm: Optional[ChatGoogleGenerativeAI] = None
         self.retriever = None
+        self.llm_limiter = ConcurrencyLimiter(
+            max_concurrency=settings.llm_max_concurrency,
+            max_queue=settings.llm_max_queue,
+        )
+        self.routing_stats = RoutingStats()
+        self.answer_cache: Optional[AnswerCache] = None
+        if settings.answer_cache_enabled:
+            self.answer_cache = AnswerCache(
+                max_entries=settings.answer_cache_max_entries,
+                ttl_seconds=settings.answer_cache_ttl_seconds,
+                semantic=settings.answer_cache_semantic,
+                similarity_threshold=settings.answer_cache_similarity,
+            )
 
     async def initialize(self):
         """Initialize all chatbot components"""
@@ -31,6 +78,61 @@ class ChatbotManager:
         await self._setup_llm()
         await self._create_qa_chain()
 
+    async def start(self, mode: Optional[str] = None):
+        """
+        Bring the chatbot up according to `settings.index_startup_mode`:
+        - "blocking": sync the index with the dataset before serving
+        - "background": serve the persisted index right away, sync it in a
+          background task (readiness waits for it only if no index exists)
+        - "off": serve the persisted index as-is, e.g. one built by `make ingest`
+        """
+        mode = mode or settings.index_startup_mode
+        await self.initialize()
+        self.index_version = read_index_version()
+        has_index = len(self.vectordb) > 0
+
+        if mode == "blocking":
+            await self.reindex()
+            self.ready = True
+        elif mode in ("background", "off"):
+            self.ready = has_index
+            if mode == "background":
+                self._sync_task = asyncio.create_task(self._background_sync())
+            elif not has_index:
+                logger.warning(
+                    "No prebuilt index found; run `make ingest` to build one."
+                )
+        else:
+            raise ValueError(f"Unknown index startup mode '{mode}'")
+
+    async def shutdown(self):
+        """Stop a background index sync that is still running"""
+        if self._sync_task and not self._sync_task.done():
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _background_sync(self):
+        try:
+            await self.reindex()
+            self.ready = True
+            logger.info("Index synced in background (version %s)", self.index_version)
+        except Exception as e:
+            self.index_error = str(e)
+            logger.exception("Background index sync failed")
+
+    def status(self) -> dict:
+        """Readiness details for the `/ready` probe"""
+        return {
+            "ready": self.ready,
+            "index_version": self.index_version,
+            "syncing": self._ingest_lock.locked(),
+            "last_ingest": self.last_ingest,
+            "error": self.index_error,
+        }
+
     async def _load_environment(self):
         """Load environment variables"""
         api_key = os.getenv("GOOGLE_API_KEY") or settings.gemini_api_key
@@ -41,50 +143,50 @@ class ChatbotManager:
         os.environ["GOOGLE_API_KEY"] = api_key
 
     async def _setup_vector_store(self):
-        """
-        Setup or load the Chroma vector store and configure retriever.
-        TODO: Make such that read all the files inside `settings.dataset_path`
-        """
+        """Load the persisted Chroma vector store and configure the retriever"""
 
         try:
-            chroma_dir = settings.chroma_persist_dir
-            embeddings = GoogleGenerativeAIEmbeddings(model=settings.embedding_model)
+            self.embeddings = create_embeddings()
+            self.vectordb = load_vector_store(self.embeddings)
 
-            if Path(chroma_dir).exists() and any(Path(chroma_dir).iterdir()):
-                # Load existing vector store
-                self.vectordb = Chroma(
-                    embedding_function=embeddings, persist_directory=chroma_dir
-                )
-                print("Existing vector store loaded!")
-            else:
-                print("Creating new vector store...")
-                loader = TextLoader(settings.dataset_path)
-                docs = loader.load()
+            if self.answer_cache:
+                self.answer_cache.embeddings = self.embeddings
 
-                splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=settings.chunk_size,
-                    chunk_overlap=settings.chunk_overlap,
+            if settings.retrieval_hybrid:
+                self.retriever = HybridRetriever(
+                    vectorstore=self.vectordb,
+                    bm25=BM25Index.from_vectorstore(self.vectordb),
+                    k=settings.retrieval_doc_k,
+                    max_docs=settings.retrieval_max_docs,
+                    token_budget=settings.retrieval_token_budget,
                 )
-                splits = splitter.split_documents(docs)
-
-                self.vectordb = Chroma.from_documents(
-                    splits,
-                    embedding=embeddings,
-                    persist_directory=chroma_dir,
+            else:
+                self.retriever = self.vectordb.as_retriever(
+                    search_kwargs={"k": settings.retrieval_doc_k}
                 )
-                print("Vector store created!")
 
-            self.retriever = self.vectordb.as_retriever(
-                search_kwargs={"k": settings.retrieval_doc_k}
-            )
-
-        except FileNotFoundError:
-            raise FileNotFoundError(
-                f"Dataset file '{settings.dataset_path}' not found."
-            )
         except Exception as e:
             raise Exception(f"Error setting up document processing: {str(e)}")
 
+    async def reindex(self, full: bool = False) -> IngestStats:
+        """Sync the vector store with the dataset directory"""
+        async with self._ingest_lock:
+            pipeline = IngestionPipeline(self.vectordb, self.embeddings)
+            stats = await pipeline.run(full=full)
+            self.index_version = stats.index_version
+            self.last_ingest = stats.as_dict()
+            self.index_error = None
+
+        if stats.changed:
+            # Keyword index and cached answers reflect the previous index
+            if isinstance(self.retriever, HybridRetriever):
+                self.retriever.bm25 = await asyncio.to_thread(
+                    BM25Index.from_vectorstore, self.vectordb
+                )
+            if self.answer_cache:
+                self.answer_cache.clear()
+        return stats
+
     async def _setup_llm(self):
         """Setup the language model"""
         self.llm = ChatGoogleGenerativeAI(
@@ -93,53 +195,159 @@ class ChatbotManager:
 
     async def _create_qa_chain(self):
         """Create the QA chain"""
-        self.qa_chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
+        self.qa_chain = TimberQAChain.from_llm(
+            llm=self.llm.with_config(tags=[ANSWER_LLM_TAG]),
+            condense_question_llm=self.llm,
             retriever=self.retriever,
             return_source_documents=True,
             combine_docs_chain_kwargs={"prompt": QA_PROMPT},
             verbose=False,
         )
 
+        # Skip the condense LLM call and retrieval where they are not needed
+        if settings.condense_skip_enabled:
+            self.qa_chain.question_generator = CondenseQuestionGate(
+                condense_chain=self.qa_chain.question_generator,
+                stats=self.routing_stats,
+            )
+            self.qa_chain.routing_stats = self.routing_stats
+
     def get_response(self, question: str, session_id: str = "default") -> dict:
         """Get response from the chatbot"""
-        if not self.qa_chain:
-            raise Exception("Chatbot not initialized")
+        if not self.ready:
+            raise ChatbotNotReadyError("Chatbot index is not ready yet")
 
-        # Get memory for this session
-        memory = self.memory_manager.get_or_create_memory(session_id)
+        # Session history is passed in per call so the chain is built only once
+        chat_history = self.memory_manager.get_history(session_id)
+        inputs = {"question": question, "chat_history": chat_history}
+        if not chat_history:
+            self.routing_stats.first_turns += 1
 
-        # Create temporary chain with session-specific memory
-        temp_chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=self.retriever,
-            memory=memory,
-            return_source_documents=True,
-            combine_docs_chain_kwargs={"prompt": QA_PROMPT},
-            verbose=False,
-        )
+        # Answer cache (first turns only, see `_cacheable`)
+        docs, vector = None, None
+        if self._cacheable(chat_history):
+            docs = self._retrieve(question)
+            vector = self.answer_cache.embed(question)
+            cached = self.answer_cache.get(question, docs, vector)
+            if cached:
+                self.memory_manager.save_turn(session_id, question, cached["answer"])
+                return cached
+            inputs[RETRIEVED_DOCS_KEY] = docs
 
         # Get response
-        result = temp_chain({"question": question})
+        result = self.qa_chain.invoke(inputs)
+        if docs is not None:
+            self.answer_cache.put(question, docs, result, vector)
+        self.memory_manager.save_turn(session_id, question, result["answer"])
         return result
 
+    async def aget_response(self, question: str, session_id: str = "default") -> dict:
+        """
+        Async counterpart of `get_response` built on the chain's async API.
+        At most `llm_max_concurrency` calls run at once; raises `QueueFullError`
+        once `llm_max_queue` callers are already waiting.
+        """
+        if not self.ready:
+            raise ChatbotNotReadyError("Chatbot index is not ready yet")
+
+        chat_history = await self.memory_manager.aget_history(session_id)
 
-class MemoryManager:
-    """Manages conversation memory for different sessions"""
+        # Cache hits never take an LLM slot
+        inputs, cached, docs, vector = await self._acache_lookup(question, chat_history)
+        if cached:
+            await self.memory_manager.asave_turn(session_id, question, cached["answer"])
+            return cached
 
-    def __init__(self):
-        self.memory_store: Dict[str, ConversationBufferWindowMemory] = {}
+        async with self.llm_limiter.slot():
+            result = await self.qa_chain.ainvoke(inputs)
 
-    def get_or_create_memory(self, session_id: str) -> ConversationBufferWindowMemory:
+        if docs is not None:
+            self.answer_cache.put(question, docs, result, vector)
+        await self.memory_manager.asave_turn(session_id, question, result["answer"])
+        return result
+
+    async def astream_response(
+        self, question: str, session_id: str = "default"
+    ) -> AsyncIterator[Tuple[str, object]]:
         """
-        Get or create memory for a specific session
-        TODO: Add DB
+        Stream the answer as `(kind, payload)` events:
+        `("start", None)` once an LLM slot is acquired, `("token", str)` for each
+        answer token and `("end", result)` with the same result dict as
+        `aget_response` (including `source_documents`).
         """
-        if session_id not in self.memory_store:
-            self.memory_store[session_id] = ConversationBufferWindowMemory(
-                k=settings.memory_window_k,
-                return_messages=True,
-                memory_key="chat_history",
-                output_key="answer",
-            )
-        return self.memory_store[session_id]
+        if not self.ready:
+            raise ChatbotNotReadyError("Chatbot index is not ready yet")
+
+        chat_history = await self.memory_manager.aget_history(session_id)
+
+        inputs, cached, docs, vector = await self._acache_lookup(question, chat_history)
+        if cached:
+            yield "start", None
+            yield "token", cached["answer"]
+            await self.memory_manager.asave_turn(session_id, question, cached["answer"])
+            yield "end", cached
+            return
+
+        async with self.llm_limiter.slot():
+            yield "start", None
+
+            root_run_id = None
+            result = None
+            async for event in self.qa_chain.astream_events(inputs, version="v2"):
+                kind = event["event"]
+                if root_run_id is None and kind == "on_chain_start":
+                    root_run_id = event["run_id"]
+                elif kind == "on_chat_model_stream" and ANSWER_LLM_TAG in event.get(
+                    "tags", []
+                ):
+                    token = event["data"]["chunk"].content
+                    if isinstance(token, str) and token:
+                        yield "token", token
+                elif kind == "on_chain_end" and event["run_id"] == root_run_id:
+                    result = event["data"]["output"]
+
+        if result is None:
+            raise Exception("Chain finished without producing an answer")
+
+        if docs is not None:
+            self.answer_cache.put(question, docs, result, vector)
+        await self.memory_manager.asave_turn(session_id, question, result["answer"])
+        yield "end", result
+
+    def _cacheable(self, chat_history) -> bool:
+        """
+        Answers are only cached for turns without history: follow-ups are
+        condensed with the history first, so the same text can mean different
+        questions in different sessions.
+        """
+        return self.answer_cache is not None and not chat_history
+
+    async def _acache_lookup(self, question: str, chat_history):
+        """
+        Retrieve once for the cache key and pass the documents on to the chain.
+        Returns `(chain_inputs, cached_result, docs, question_vector)`.
+        """
+        inputs = {"question": question, "chat_history": chat_history}
+        if not chat_history:
+            self.routing_stats.first_turns += 1
+        if not self._cacheable(chat_history):
+            return inputs, None, None, None
+
+        docs = await self._aretrieve(question)
+        vector = await self.answer_cache.aembed(question)
+        cached = self.answer_cache.get(question, docs, vector)
+        inputs[RETRIEVED_DOCS_KEY] = docs
+        return inputs, cached, docs, vector
+
+    def _retrieve(self, question: str) -> List[Document]:
+        """Retrieve context, or nothing for small talk when skipping is on"""
+        if settings.condense_skip_enabled and is_small_talk(question):
+            self.routing_stats.retrieval_skipped += 1
+            return []
+        return self.retriever.invoke(question)
+
+    async def _aretrieve(self, question: str) -> List[Document]:
+        if settings.condense_skip_enabled and is_small_talk(question):
+            self.routing_stats.retrieval_skipped += 1
+            return []
+        return await self.retriever.ainvoke(question)
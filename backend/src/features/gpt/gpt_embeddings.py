@@ -0,0 +1,158 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain_core.embeddings import Embeddings
+from langchain_core.stores import BaseStore
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from src.core import settings
+
+
+class SQLiteEmbeddingStore(BaseStore[str, List[float]]):
+    """
+    Content-addressed embedding store in a single SQLite file.
+
+    Keys are the SHA-256 of `namespace` + text, values are float32 blobs.
+    Several processes can share the file (WAL mode). With `max_entries`,
+    the oldest rows are pruned once the table grows past the limit.
+    """
+
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, namespace: str, max_entries: Optional[int] = None):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, namespace TEXT NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).digest()
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        hashed = [self._key(text) for text in keys]
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(hashed), 500):
+                part = hashed[i : i + 500]
+                rows = self._conn.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN "
+                    f"({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                found.update(rows)
+
+        values = []
+        for key in hashed:
+            blob = found.get(key)
+            values.append(
+                None if blob is None else np.frombuffer(blob, np.float32).tolist()
+            )
+        hits = sum(value is not None for value in values)
+        self.hits += hits
+        self.misses += len(values) - hits
+        return values
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, List[float]]]) -> None:
+        rows = [
+            (self._key(text), self.namespace, np.asarray(vector, np.float32).tobytes())
+            for text, vector in key_value_pairs
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, namespace, vector) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._writes += len(rows)
+            if self.max_entries and self._writes >= self._PRUNE_EVERY:
+                self._writes = 0
+                self._prune()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM embeddings WHERE key = ?",
+                [(self._key(text),) for text in keys],
+            )
+            self._conn.commit()
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        # Texts are not stored, only their hashes
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM embeddings WHERE namespace = ?", (self.namespace,)
+            ).fetchall()
+        for (key,) in rows:
+            yield key.hex()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _prune(self):
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE namespace = ? AND rowid NOT IN ("
+            " SELECT rowid FROM embeddings WHERE namespace = ?"
+            " ORDER BY rowid DESC LIMIT ?)",
+            (self.namespace, self.namespace, self.max_entries),
+        )
+        self._conn.commit()
+
+
+def create_embeddings() -> Embeddings:
+    """
+    Gemini embeddings, fronted by the on-disk cache at
+    `settings.embedding_cache_path` unless that is empty. Document and query
+    embeddings are cached separately since Gemini embeds them differently.
+    """
+    underlying = GoogleGenerativeAIEmbeddings(model=settings.embedding_model)
+    if not settings.embedding_cache_path:
+        return underlying
+
+    return CacheBackedEmbeddings(
+        underlying,
+        SQLiteEmbeddingStore(
+            settings.embedding_cache_path,
+            namespace=f"{settings.embedding_model}:document",
+        ),
+        batch_size=settings.ingest_batch_size,
+        query_embedding_store=SQLiteEmbeddingStore(
+            settings.embedding_cache_path,
+            namespace=f"{settings.embedding_model}:query",
+            max_entries=settings.embedding_cache_max_queries,
+        ),
+    )
+
+
+def embedding_cache_stats(embeddings: Embeddings) -> Optional[dict]:
+    """Hit/miss counters of a cache-backed embeddings object"""
+    if not isinstance(embeddings, CacheBackedEmbeddings):
+        return None
+    return {
+        "documents": embeddings.document_embedding_store.stats(),
+        "queries": embeddings.query_embedding_store.stats(),
+    }
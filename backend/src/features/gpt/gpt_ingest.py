@@ -0,0 +1,323 @@
+"""
+Incremental ingestion of the dataset directory into the Chroma vector store.
+
+Run as a CLI from `backend/`:
+    uv run python -m src.features.gpt.gpt_ingest [--dataset datasets] [--full]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.vectorstores import Chroma
+
+from src.core import settings
+
+MANIFEST_NAME = "ingest_manifest.json"
+SUPPORTED_SUFFIXES = {".txt", ".md"}
+
+
+@dataclass
+class IngestStats:
+    files_scanned: int = 0
+    files_changed: int = 0
+    files_removed: int = 0
+    chunks_added: int = 0
+    chunks_deleted: int = 0
+    chunks_unchanged: int = 0
+    embed_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    removed_files: List[str] = field(default_factory=list)
+    index_version: Optional[str] = None
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.chunks_added or self.chunks_deleted)
+
+    @property
+    def chunks_per_second(self) -> float:
+        if not self.embed_seconds:
+            return 0.0
+        return self.chunks_added / self.embed_seconds
+
+    def as_dict(self) -> Dict:
+        data = asdict(self)
+        data["changed"] = self.changed
+        data["chunks_per_second"] = round(self.chunks_per_second, 2)
+        data["embed_seconds"] = round(self.embed_seconds, 3)
+        data["elapsed_seconds"] = round(self.elapsed_seconds, 3)
+        return data
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Content-addressed chunk ID, scoped to its source file"""
+    return sha256_hex(f"{source}\0{text}".encode("utf-8"))[:40]
+
+
+def index_version(config: Dict, files: Dict[str, Dict]) -> str:
+    """Version of an index: changes whenever its config or any chunk changes"""
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8"))
+    for source in sorted(files):
+        for cid in files[source]["chunk_ids"]:
+            digest.update(cid.encode("ascii"))
+    return digest.hexdigest()[:16]
+
+
+def read_index_version() -> Optional[str]:
+    """Version recorded in the persisted manifest, if an index was built"""
+    manifest_path = Path(settings.chroma_persist_dir) / MANIFEST_NAME
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8")).get("version")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def load_vector_store(embeddings) -> Chroma:
+    """Open (or create) the persisted Chroma collection"""
+    return Chroma(
+        embedding_function=embeddings,
+        persist_directory=settings.chroma_persist_dir,
+    )
+
+
+class IngestionPipeline:
+    """
+    Syncs `dataset_path` (a file or a directory walked recursively) into the
+    vector store. Unchanged files are skipped by content hash, only chunks
+    missing from the store are embedded, in concurrent batches, and vectors
+    of removed or edited content are deleted.
+    """
+
+    def __init__(
+        self,
+        vectordb: Chroma,
+        embeddings,
+        dataset_path: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        progress: Callable[[str], None] = print,
+    ):
+        self.vectordb = vectordb
+        self.embeddings = embeddings
+        self.dataset_path = Path(dataset_path or settings.dataset_path)
+        self.batch_size = batch_size or settings.ingest_batch_size
+        self.concurrency = concurrency or settings.ingest_concurrency
+        self.progress = progress
+        self.manifest_path = Path(settings.chroma_persist_dir) / MANIFEST_NAME
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap,
+        )
+
+    def dataset_files(self) -> List[Path]:
+        if self.dataset_path.is_file():
+            return [self.dataset_path]
+        if not self.dataset_path.is_dir():
+            raise FileNotFoundError(f"Dataset path '{self.dataset_path}' not found.")
+        return sorted(
+            path
+            for path in self.dataset_path.rglob("*")
+            if path.is_file() and path.suffix.lower() in SUPPORTED_SUFFIXES
+        )
+
+    def load_manifest(self) -> Optional[Dict]:
+        """
+        The manifest of the last run, or None when there is none or it was
+        built with another embedding model or chunking: vectors already in
+        the store are then not reusable, whatever their chunk IDs
+        """
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if manifest.get("config") != self._config():
+            return None
+        return manifest
+
+    async def run(self, full: bool = False) -> IngestStats:
+        """Bring the vector store in line with the dataset"""
+        started = time.perf_counter()
+        stats = IngestStats()
+
+        # Chroma calls and file hashing block, so they run off the event
+        # loop: a background sync at startup must not stall requests
+        manifest = None if full else await asyncio.to_thread(self.load_manifest)
+        existing = await asyncio.to_thread(self.vectordb.get, include=[])
+        existing_ids = set(existing["ids"])
+
+        # Without a matching manifest every chunk is re-embedded: the upsert
+        # replaces vectors under the same IDs and the rest are deleted below
+        reusable_ids = existing_ids if manifest else set()
+        manifest = manifest or {"files": {}}
+        files, pending = await asyncio.to_thread(
+            self._scan, manifest, reusable_ids, stats
+        )
+
+        stats.removed_files = sorted(set(manifest["files"]) - set(files))
+        stats.files_removed = len(stats.removed_files)
+
+        wanted = {cid for entry in files.values() for cid in entry["chunk_ids"]}
+        stale = sorted(existing_ids - wanted)
+
+        await self._embed_and_upsert(pending, stats)
+        await asyncio.to_thread(self._delete, stale, stats)
+        stats.index_version = await asyncio.to_thread(self._save_manifest, files)
+
+        stats.elapsed_seconds = time.perf_counter() - started
+        self.progress(
+            f"[ingest] {stats.files_scanned} files, +{stats.chunks_added} "
+            f"-{stats.chunks_deleted} ={stats.chunks_unchanged} chunks "
+            f"in {stats.elapsed_seconds:.2f}s "
+            f"({stats.chunks_per_second:.1f} chunks/s embedded)"
+        )
+        return stats
+
+    def _scan(self, manifest: Dict, existing_ids: set, stats: IngestStats):
+        """
+        Hash and chunk the dataset files. Returns the new manifest entries
+        and the chunks still to embed (chunk_id -> (text, metadata)).
+        """
+        files: Dict[str, Dict] = {}
+        pending: Dict[str, tuple] = {}
+
+        for path in self.dataset_files():
+            stats.files_scanned += 1
+            source = str(path)
+            file_hash = sha256_hex(path.read_bytes())
+            known = manifest["files"].get(source)
+
+            if (
+                known
+                and known["sha256"] == file_hash
+                and existing_ids.issuperset(known["chunk_ids"])
+            ):
+                files[source] = known
+                stats.chunks_unchanged += len(known["chunk_ids"])
+                continue
+
+            stats.files_changed += 1
+            text = path.read_text(encoding="utf-8")
+            ids: List[str] = []
+            for index, chunk in enumerate(self.splitter.split_text(text)):
+                cid = chunk_id(source, chunk)
+                if cid in ids:
+                    continue
+                ids.append(cid)
+                if cid in existing_ids:
+                    stats.chunks_unchanged += 1
+                elif cid not in pending:
+                    pending[cid] = (
+                        chunk,
+                        {
+                            "source": source,
+                            "chunk_index": index,
+                            "chunk_id": cid,
+                            "file_sha256": file_hash,
+                        },
+                    )
+            files[source] = {"sha256": file_hash, "chunk_ids": ids}
+        return files, pending
+
+    async def _embed_and_upsert(self, pending: Dict[str, tuple], stats: IngestStats):
+        if not pending:
+            return
+
+        items = list(pending.items())
+        batches = [
+            items[i : i + self.batch_size]
+            for i in range(0, len(items), self.batch_size)
+        ]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+
+        async def embed_batch(batch):
+            async with semaphore:
+                texts = [text for _, (text, _) in batch]
+                vectors = await self.embeddings.aembed_documents(texts)
+
+            await asyncio.to_thread(self._upsert, batch, texts, vectors)
+            stats.chunks_added += len(batch)
+            elapsed = time.perf_counter() - started
+            self.progress(
+                f"[ingest] embedded {stats.chunks_added}/{len(items)} chunks "
+                f"({stats.chunks_added / elapsed:.1f} chunks/s)"
+            )
+
+        await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        stats.embed_seconds = time.perf_counter() - started
+
+    def _upsert(self, batch: list, texts: List[str], vectors: List[List[float]]):
+        # The only private access to the store: the public `add_texts` embeds
+        # the texts itself, and these were embedded above in concurrent
+        # batches; the underlying collection takes precomputed vectors
+        self.vectordb._collection.upsert(
+            ids=[cid for cid, _ in batch],
+            embeddings=vectors,
+            documents=texts,
+            metadatas=[metadata for _, (_, metadata) in batch],
+        )
+
+    def _delete(self, ids: List[str], stats: IngestStats):
+        for i in range(0, len(ids), self.batch_size):
+            self.vectordb.delete(ids=ids[i : i + self.batch_size])
+        stats.chunks_deleted = len(ids)
+
+    def _save_manifest(self, files: Dict[str, Dict]) -> str:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        version = index_version(self._config(), files)
+        manifest = {
+            "version": version,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "config": self._config(),
+            "files": files,
+        }
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self.manifest_path)
+        return version
+
+    @staticmethod
+    def _config() -> Dict:
+        return {
+            "embedding_model": settings.embedding_model,
+            "chunk_size": settings.chunk_size,
+            "chunk_overlap": settings.chunk_overlap,
+        }
+
+
+async def _main(args: argparse.Namespace):
+    from .gpt_embeddings import create_embeddings
+
+    os.environ.setdefault("GOOGLE_API_KEY", settings.gemini_api_key)
+    embeddings = create_embeddings()
+    pipeline = IngestionPipeline(
+        load_vector_store(embeddings),
+        embeddings,
+        dataset_path=args.dataset,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+    )
+    stats = await pipeline.run(full=args.full)
+    print(json.dumps(stats.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the dataset into Chroma")
+    parser.add_argument("--dataset", help="File or directory (default: DATASET_PATH)")
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument(
+        "--full", action="store_true", help="Ignore the manifest and re-embed all"
+    )
+    asyncio.run(_main(parser.parse_args()))
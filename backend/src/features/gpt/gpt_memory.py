@@ -0,0 +1,368 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, delete, select, update
+
+from src.core import settings
+from src.models import ChatSession
+
+# One conversation turn: (question, answer)
+Turn = Tuple[str, str]
+
+
+def serialize_history(turns: List[Turn]) -> str:
+    """Compact JSON encoding of a session's turns"""
+    return json.dumps(turns, ensure_ascii=False, separators=(",", ":"))
+
+
+def deserialize_history(payload: str) -> List[Turn]:
+    return [(question, answer) for question, answer in json.loads(payload)]
+
+
+def _turns_size(turns: List[Turn]) -> int:
+    return sum(len(question) + len(answer) for question, answer in turns)
+
+
+def trim_turns(turns: List[Turn], window_k: int, max_chars: int) -> List[Turn]:
+    """The last `window_k` turns, oldest dropped first to fit `max_chars`"""
+    turns = turns[-window_k:] if window_k > 0 else []
+    while len(turns) > 1 and _turns_size(turns) > max_chars:
+        turns.pop(0)
+    return turns
+
+
+class SessionStore(ABC):
+    """Interface of a conversation history backend"""
+
+    # True when calls do I/O and should be kept off the event loop
+    blocking = False
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[List[Turn]]: ...
+
+    @abstractmethod
+    def put(self, session_id: str, turns: List[Turn]): ...
+
+    @abstractmethod
+    def append(
+        self, session_id: str, turn: Turn, window_k: int, max_chars: int
+    ) -> List[Turn]:
+        """
+        Add a turn and trim the session with `trim_turns`, atomically: two
+        workers appending to the same session both keep their turn.
+        Returns the stored turns.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str): ...
+
+    @abstractmethod
+    def session_ids(self) -> List[str]: ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store bounded by session count, total characters and idle
+    time. The least recently used session is evicted first.
+    """
+
+    def __init__(
+        self, max_sessions: int, max_total_chars: int, idle_ttl_seconds: float
+    ):
+        self.max_sessions = max_sessions
+        self.max_total_chars = max_total_chars
+        self.idle_ttl_seconds = idle_ttl_seconds
+
+        # session_id -> (turns, size, last_access)
+        self._sessions: "OrderedDict[str, Tuple[List[Turn], int, float]]" = (
+            OrderedDict()
+        )
+        self._total_chars = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, session_id: str) -> Optional[List[Turn]]:
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            turns, size, _ = entry
+            self._sessions[session_id] = (turns, size, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            return list(turns)
+
+    def put(self, session_id: str, turns: List[Turn]):
+        with self._lock:
+            self._put(session_id, list(turns))
+
+    def append(
+        self, session_id: str, turn: Turn, window_k: int, max_chars: int
+    ) -> List[Turn]:
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._sessions.get(session_id)
+            history = entry[0] if entry else []
+            turns = trim_turns(history + [turn], window_k, max_chars)
+            self._put(session_id, turns)
+            return list(turns)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._drop(session_id)
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return list(self._sessions)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "total_chars": self._total_chars,
+            "evictions": self.evictions,
+        }
+
+    def _put(self, session_id: str, turns: List[Turn]):
+        size = _turns_size(turns)
+        self._drop(session_id)
+        self._sessions[session_id] = (turns, size, time.monotonic())
+        self._total_chars += size
+
+        self._expire(time.monotonic())
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions
+            or self._total_chars > self.max_total_chars
+        ):
+            oldest = next(iter(self._sessions))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, session_id: str):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._total_chars -= entry[1]
+
+    def _expire(self, now: float):
+        # Least recently used first, so stop at the first live session
+        while self._sessions:
+            oldest = next(iter(self._sessions))
+            if now - self._sessions[oldest][2] < self.idle_ttl_seconds:
+                break
+            self._drop(oldest)
+            self.evictions += 1
+
+
+class SQLSessionStore(SessionStore):
+    """Durable store on the application's SQLModel engine, shared by all workers"""
+
+    blocking = True
+
+    # Prune idle rows once every this many writes
+    _PRUNE_EVERY = 500
+
+    def __init__(self, engine, idle_ttl_seconds: float):
+        self.engine = engine
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._writes = 0
+
+    def get(self, session_id: str) -> Optional[List[Turn]]:
+        with Session(self.engine) as session:
+            row = session.get(ChatSession, session_id)
+            return deserialize_history(row.history) if row else None
+
+    def put(self, session_id: str, turns: List[Turn]):
+        with Session(self.engine) as session:
+            row = session.get(ChatSession, session_id) or ChatSession(
+                session_id=session_id
+            )
+            row.history = serialize_history(turns)
+            row.updated_at = datetime.now(timezone.utc)
+            session.add(row)
+            session.commit()
+        self._count_write()
+
+    def append(
+        self, session_id: str, turn: Turn, window_k: int, max_chars: int
+    ) -> List[Turn]:
+        try:
+            turns = self._append(session_id, turn, window_k, max_chars)
+        except IntegrityError:
+            # Another worker created the session first; its row is there now
+            turns = self._append(session_id, turn, window_k, max_chars)
+        self._count_write()
+        return turns
+
+    def _append(
+        self, session_id: str, turn: Turn, window_k: int, max_chars: int
+    ) -> List[Turn]:
+        now = datetime.now(timezone.utc)
+        with Session(self.engine) as session:
+            # Touch the row before reading it: the UPDATE takes its write lock
+            # (a row lock on server databases, the database lock on SQLite)
+            # until commit, so a concurrent append waits instead of reading
+            # the history this one is about to replace
+            touched = session.exec(
+                update(ChatSession)
+                .where(ChatSession.session_id == session_id)
+                .values(updated_at=now)
+            ).rowcount
+            row = session.get(ChatSession, session_id) if touched else None
+            history = deserialize_history(row.history) if row else []
+            turns = trim_turns(history + [turn], window_k, max_chars)
+
+            row = row or ChatSession(session_id=session_id)
+            row.history = serialize_history(turns)
+            row.updated_at = now
+            session.add(row)
+            session.commit()
+        return turns
+
+    def delete(self, session_id: str):
+        with Session(self.engine) as session:
+            session.exec(
+                delete(ChatSession).where(ChatSession.session_id == session_id)
+            )
+            session.commit()
+
+    def session_ids(self) -> List[str]:
+        with Session(self.engine) as session:
+            return list(session.exec(select(ChatSession.session_id)).all())
+
+    def _count_write(self):
+        self._writes += 1
+        if self._writes % self._PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Delete sessions idle for longer than `idle_ttl_seconds`"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.idle_ttl_seconds)
+        with Session(self.engine) as session:
+            session.exec(delete(ChatSession).where(ChatSession.updated_at < cutoff))
+            session.commit()
+
+
+class TieredSessionStore(SessionStore):
+    """
+    In-memory tier in front of a durable store. Writes go to both tiers; a
+    memory hit is trusted for `fresh_seconds` before the durable copy is
+    re-read, which bounds how stale history written by another worker can be.
+    """
+
+    blocking = True
+
+    def __init__(
+        self, memory: InMemorySessionStore, durable: SessionStore, fresh_seconds: float
+    ):
+        self.memory = memory
+        self.durable = durable
+        self.fresh_seconds = fresh_seconds
+        # Calls come from `asyncio.to_thread` workers
+        self._loaded_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[List[Turn]]:
+        with self._lock:
+            loaded_at = self._loaded_at.get(session_id)
+        if loaded_at is not None and time.monotonic() - loaded_at < self.fresh_seconds:
+            turns = self.memory.get(session_id)
+            if turns is not None:
+                return turns
+
+        turns = self.durable.get(session_id)
+        if turns is not None:
+            self._remember(session_id, turns)
+        return turns
+
+    def put(self, session_id: str, turns: List[Turn]):
+        self.durable.put(session_id, turns)
+        self._remember(session_id, turns)
+
+    def append(
+        self, session_id: str, turn: Turn, window_k: int, max_chars: int
+    ) -> List[Turn]:
+        turns = self.durable.append(session_id, turn, window_k, max_chars)
+        self._remember(session_id, turns)
+        return turns
+
+    def delete(self, session_id: str):
+        self.durable.delete(session_id)
+        self.memory.delete(session_id)
+        with self._lock:
+            self._loaded_at.pop(session_id, None)
+
+    def session_ids(self) -> List[str]:
+        return self.durable.session_ids()
+
+    def stats(self) -> dict:
+        return self.memory.stats()
+
+    def _remember(self, session_id: str, turns: List[Turn]):
+        self.memory.put(session_id, turns)
+        with self._lock:
+            self._loaded_at[session_id] = time.monotonic()
+            if len(self._loaded_at) > 2 * self.memory.max_sessions:
+                live = set(self.memory.session_ids())
+                self._loaded_at = {
+                    k: v for k, v in self._loaded_at.items() if k in live
+                }
+
+
+def create_session_store() -> SessionStore:
+    """Build the store selected by `settings.session_store`"""
+    memory = InMemorySessionStore(
+        max_sessions=settings.session_max_sessions,
+        max_total_chars=settings.session_max_total_chars,
+        idle_ttl_seconds=settings.session_idle_ttl_seconds,
+    )
+    if settings.session_store == "memory":
+        return memory
+    if settings.session_store == "db":
+        from src.core.db import engine
+
+        durable = SQLSessionStore(engine, settings.session_idle_ttl_seconds)
+        return TieredSessionStore(memory, durable, settings.session_cache_seconds)
+    raise ValueError(f"Unknown session store '{settings.session_store}'")
+
+
+class MemoryManager:
+    """Manages conversation memory for different sessions"""
+
+    def __init__(self, store: Optional[SessionStore] = None):
+        self.store = store or create_session_store()
+        self.window_k = settings.memory_window_k
+        self.max_chars = settings.session_max_chars
+
+    def get_history(self, session_id: str) -> List[BaseMessage]:
+        """Chat history of a session as chain-ready messages"""
+        messages: List[BaseMessage] = []
+        for question, answer in self.store.get(session_id) or []:
+            messages.append(HumanMessage(content=question))
+            messages.append(AIMessage(content=answer))
+        return messages
+
+    def save_turn(self, session_id: str, question: str, answer: str):
+        """Append a turn, keeping the last `memory_window_k` within `session_max_chars`"""
+        self.store.append(session_id, (question, answer), self.window_k, self.max_chars)
+
+    async def aget_history(self, session_id: str) -> List[BaseMessage]:
+        if self.store.blocking:
+            return await asyncio.to_thread(self.get_history, session_id)
+        return self.get_history(session_id)
+
+    async def asave_turn(self, session_id: str, question: str, answer: str):
+        if self.store.blocking:
+            await asyncio.to_thread(self.save_turn, session_id, question, answer)
+        else:
+            self.save_turn(session_id, question, answer)
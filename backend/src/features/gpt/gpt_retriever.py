@@ -0,0 +1,153 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from .gpt_cache import document_id, normalize_question
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), no tokenizer round-trip"""
+    return max(1, len(text) // 4)
+
+
+class BM25Index:
+    """Okapi BM25 keyword index over the chunks of the vector store"""
+
+    def __init__(self, docs: List[Document], k1: float = 1.5, b: float = 0.75):
+        self.docs = docs
+        self.k1 = k1
+        self.b = b
+
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths = np.zeros(len(docs), dtype=np.float32)
+        for index, doc in enumerate(docs):
+            terms = Counter(tokenize(doc.page_content))
+            lengths[index] = sum(terms.values())
+            for term, tf in terms.items():
+                postings[term].append((index, tf))
+
+        n = len(docs)
+        avg_length = float(lengths.mean()) if n else 0.0
+        self._norm = self.k1 * (1 - self.b + self.b * lengths / (avg_length or 1.0))
+        # term -> (doc indices, term frequencies, idf)
+        self._postings = {
+            term: (
+                np.fromiter((i for i, _ in entries), dtype=np.int32),
+                np.fromiter((tf for _, tf in entries), dtype=np.float32),
+                math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5)),
+            )
+            for term, entries in postings.items()
+        }
+
+    @classmethod
+    def from_vectorstore(cls, vectordb) -> "BM25Index":
+        """Index every chunk currently stored in a Chroma collection"""
+        data = vectordb.get(include=["documents", "metadatas"])
+        docs = [
+            Document(page_content=text, metadata=metadata or {}, id=doc_id)
+            for doc_id, text, metadata in zip(
+                data["ids"], data["documents"], data["metadatas"]
+            )
+        ]
+        return cls(docs)
+
+    def search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        if not self.docs:
+            return []
+
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for term in set(tokenize(query)):
+            entry = self._postings.get(term)
+            if entry is None:
+                continue
+            indices, tf, idf = entry
+            scores[indices] += idf * tf * (self.k1 + 1) / (tf + self._norm[indices])
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.docs[i], float(scores[i])) for i in top]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Merges Chroma similarity search with a local BM25 index using reciprocal
+    rank fusion, drops duplicate chunks, reranks the candidates by query-term
+    coverage and returns at most `max_docs` chunks within `token_budget`.
+    """
+
+    vectorstore: Any
+    bm25: Optional[BM25Index] = None
+    k: int = 8
+    max_docs: int = 4
+    token_budget: int = 1500
+    rrf_k: int = 60
+    coverage_weight: float = 0.02
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        vector_docs = self.vectorstore.similarity_search(query, k=self.k)
+        return self._select(query, vector_docs)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        vector_docs = await self.vectorstore.asimilarity_search(query, k=self.k)
+        return self._select(query, vector_docs)
+
+    def _select(self, query: str, vector_docs: List[Document]) -> List[Document]:
+        keyword_docs = (
+            [doc for doc, _ in self.bm25.search(query, self.k)] if self.bm25 else []
+        )
+
+        # Reciprocal rank fusion, deduplicated by chunk ID and by content
+        fused: Dict[str, Tuple[Document, float]] = {}
+        seen_content: Dict[str, str] = {}
+        for ranked in (vector_docs, keyword_docs):
+            for rank, doc in enumerate(ranked):
+                key = seen_content.setdefault(
+                    normalize_question(doc.page_content), document_id(doc)
+                )
+                previous = fused.get(key, (doc, 0.0))
+                fused[key] = (previous[0], previous[1] + 1.0 / (self.rrf_k + rank + 1))
+
+        # Cheap local rerank: favour chunks that cover more of the query terms
+        query_terms = set(tokenize(query))
+        scored = []
+        for doc, score in fused.values():
+            if query_terms:
+                coverage = len(query_terms & set(tokenize(doc.page_content)))
+                score += self.coverage_weight * coverage / len(query_terms)
+            scored.append((score, doc))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        selected, used = [], 0
+        for _, doc in scored:
+            if len(selected) >= self.max_docs:
+                break
+            tokens = estimate_tokens(doc.page_content)
+            if selected and used + tokens > self.token_budget:
+                continue
+            selected.append(doc)
+            used += tokens
+        return selected
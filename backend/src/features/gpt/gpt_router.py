@@ -1,5 +1,8 @@
+import asyncio
+import json
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.requests import Request
+from fastapi.responses import StreamingResponse
 from typing import List, Dict
 
 from .gpt_schemas import (
@@ -7,7 +10,11 @@ from .gpt_schemas import (
     ChatResponse,
     SessionsResponse,
 )
-from .gpt_core import ChatbotManager
+from .gpt_core import ChatbotManager, ChatbotNotReadyError
+from .gpt_embeddings import embedding_cache_stats
+from src.core.concurrency import QueueFullError
+from src.schemas import TokenData
+from src.security import oauth2
 
 router = APIRouter(prefix="/gpt")
 
@@ -17,6 +24,29 @@ def get_chatbot_manager(request: Request) -> ChatbotManager:
     return request.app.state.chatbot_manager
 
 
+def format_sources(source_documents) -> List[Dict]:
+    """Shape retrieved documents for the API response"""
+    sources = []
+    for i, doc in enumerate(source_documents or [], start=1):
+        sources.append(
+            {
+                "source_id": i,
+                "metadata": doc.metadata,
+                "content_preview": (
+                    doc.page_content[:200] + "..."
+                    if len(doc.page_content) > 200
+                    else doc.page_content
+                ),
+            }
+        )
+    return sources
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
 @router.post("/gpt", response_model=ChatResponse)
 async def chat_endpoint(
     request: ChatRequest, chatbot_manager: ChatbotManager = Depends(get_chatbot_manager)
@@ -24,31 +54,133 @@ async def chat_endpoint(
     """Main chat endpoint for the forestry expert chatbot"""
     try:
         # Get response from chatbot
-        result = chatbot_manager.get_response(
+        result = await chatbot_manager.aget_response(
             question=request.question, session_id=request.session_id
         )
 
         # Format sources
-        sources = []
-        if result.get("source_documents"):
-            for i, doc in enumerate(result["source_documents"], start=1):
-                sources.append(
-                    {
-                        "source_id": i,
-                        "metadata": doc.metadata,
-                        "content_preview": (
-                            doc.page_content[:200] + "..."
-                            if len(doc.page_content) > 200
-                            else doc.page_content
-                        ),
-                    }
-                )
+        sources = format_sources(result.get("source_documents"))
 
         return ChatResponse(
             answer=result["answer"], session_id=request.session_id, sources=sources
         )
 
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": "1"}
+        )
+    except ChatbotNotReadyError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "5"}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error processing request: {str(e)}"
         )
+
+
+@router.post("/gpt/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest, chatbot_manager: ChatbotManager = Depends(get_chatbot_manager)
+):
+    """
+    Streaming variant of the chat endpoint (server-sent events).
+    Emits `start`, then one `token` event per answer chunk and a final `end`
+    event carrying the sources; failures after the stream began arrive as `error`.
+    """
+    events = chatbot_manager.astream_response(
+        question=request.question, session_id=request.session_id
+    )
+
+    # Wait for an LLM slot before committing to a 200 so overload is still a 429
+    try:
+        await events.__anext__()
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": "1"}
+        )
+    except ChatbotNotReadyError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "5"}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error processing request: {str(e)}"
+        )
+
+    async def event_stream():
+        yield sse_event("start", {"session_id": request.session_id})
+        try:
+            async for kind, payload in events:
+                if kind == "token":
+                    yield sse_event("token", {"content": payload})
+                elif kind == "end":
+                    yield sse_event(
+                        "end",
+                        {
+                            "session_id": request.session_id,
+                            "sources": format_sources(payload.get("source_documents")),
+                        },
+                    )
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error processing request: {str(e)}"})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/ingest")
+async def ingest_endpoint(
+    full: bool = False,
+    chatbot_manager: ChatbotManager = Depends(get_chatbot_manager),
+    admin: TokenData = Depends(oauth2.get_admin_user),
+):
+    """
+    Sync the vector store with the dataset directory. Admins only (see
+    ADMIN_EMAILS).
+    Only new or changed chunks are embedded (every chunk with `full=true`);
+    returns ingestion statistics.
+    """
+    try:
+        stats = await chatbot_manager.reindex(full=full)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return stats.as_dict()
+
+
+@router.get("/sessions", response_model=SessionsResponse)
+async def sessions_endpoint(
+    chatbot_manager: ChatbotManager = Depends(get_chatbot_manager),
+):
+    """List the sessions that currently have conversation history"""
+    store = chatbot_manager.memory_manager.store
+    if store.blocking:
+        session_ids = await asyncio.to_thread(store.session_ids)
+    else:
+        session_ids = store.session_ids()
+    return SessionsResponse(
+        active_sessions=session_ids, total_sessions=len(session_ids)
+    )
+
+
+@router.get("/stats")
+async def stats_endpoint(
+    chatbot_manager: ChatbotManager = Depends(get_chatbot_manager),
+):
+    """Runtime counters of the chatbot"""
+    return {
+        "llm": chatbot_manager.llm_limiter.stats(),
+        "sessions": chatbot_manager.memory_manager.store.stats(),
+        "routing": chatbot_manager.routing_stats.as_dict(),
+        "answer_cache": (
+            chatbot_manager.answer_cache.stats()
+            if chatbot_manager.answer_cache
+            else None
+        ),
+        "embedding_cache": embedding_cache_stats(chatbot_manager.embeddings),
+    }
@@ -1,100 +1,125 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import httpx
-import numpy as np
-import cv2
-import matplotlib.pyplot as plt
-import io
-import base64
-from starlette.responses import StreamingResponse
-from fastapi.responses import JSONResponse
+import asyncio
+from typing import Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import FileResponse
 from ...core.config import settings
+from ...core.executors import get_image_pool
+from .artifacts import get_artifact_store
+from .defect_core import decode_image, render_defect_analysis
+from .inference_backends import InferenceBackend, get_inference_backend
+from .memory import PeakRSS, process_memory
+from .outputs import Images, OutputMode, build_image_response
+from .preprocess import ModelUpload
+from .timing import StageTimer
+from .uploads import ImageUploadRoute, read_image_upload
+
+
+router = APIRouter(route_class=ImageUploadRoute)
+
+LOG_SURFACE_MODEL_ID = "wood_segment/17"
+DEFECT_MODEL_ID = "complete_knot-wi27y/1"
+
+
+async def run_defect_analysis(
+    image_bytes: bytes,
+    backend: InferenceBackend,
+    visualize: bool = True,
+    fmt: str = "png",
+    quality: int = 90,
+    renderer: Optional[str] = None,
+) -> Tuple[dict, Images]:
+    """
+    Decode, both models and post-processing for one image.
+    Returns the JSON payload and the encoded images still to be attached.
+    """
+    timer = StageTimer()
+    memory = PeakRSS(settings.memory_sample_interval_ms)
+    pool = get_image_pool()
+    digest = await timer.track("hash", backend.digest(image_bytes))
+
+    # One decode serves post-processing and the (downscaled) model upload;
+    # cache lookups for both models start while it runs
+    decoded = asyncio.ensure_future(
+        timer.track("decode", pool.run(decode_image, image_bytes))
+    )
+    upload = ModelUpload(image_bytes, decoded, pool, timer)
+    image, log_surface_result, defect_result = await asyncio.gather(
+        decoded,
+        timer.track(
+            "log_surface_inference",
+            backend.infer(LOG_SURFACE_MODEL_ID, digest, upload),
+        ),
+        timer.track(
+            "defect_inference",
+            backend.infer(DEFECT_MODEL_ID, digest, upload),
+        ),
+    )
+    if image is None:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+
+    # Masks and rendering are CPU-bound: keep them off the event loop
+    result = await timer.track(
+        "postprocess",
+        pool.run(
+            render_defect_analysis,
+            image,
+            log_surface_result,
+            defect_result,
+            renderer or settings.image_renderer,
+            fmt,
+            quality,
+            visualize,
+        ),
+    )
+    timer.timings.update(result.pop("timings_ms"))
+    timer.log("/analyze")
+
+    images = result.pop("images")
+    payload = {**result, "timings_ms": timer.as_dict(), "memory_mb": memory.stop()}
+    if images:
+        payload["image_format"] = fmt
+    return payload, images
 
 
-router = APIRouter()
-
-ROBOFLOW_API_KEY =  settings.roboflow_api_key
-ROBOFLOW_API_URL = "https://serverless.roboflow.com"
-
-# Helper to call Roboflow API using httpx
-async def call_roboflow_model(image_bytes: bytes, model_id: str):
-    encoded_image = base64.b64encode(image_bytes).decode("utf-8")
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{ROBOFLOW_API_URL}/{model_id}",
-            params={"api_key": ROBOFLOW_API_KEY},
-            content=encoded_image,
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            timeout=30.0
-        )
-
-    if response.status_code != 200:
-        raise HTTPException(status_code=response.status_code, detail=response.text)
-
-    return response.json()
-
 @router.post("/analyze")
-async def analyze_defect(file: UploadFile = File(...)):
-    # Read uploaded file bytes
-    image_bytes = await file.read()
-    np_arr = np.frombuffer(image_bytes, np.uint8)
-    image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-    # Call Roboflow models
-    log_surface_result = await call_roboflow_model(image_bytes, "wood_segment/17")
-    defect_result = await call_roboflow_model(image_bytes, "complete_knot-wi27y/1")
-
-    # Create blank masks
-    log_mask = np.zeros(image.shape[:2], dtype=np.uint8)
-    defect_mask = np.zeros(image.shape[:2], dtype=np.uint8)
-
-    # Draw log surface polygons
-    for pred in log_surface_result.get("predictions", []):
-        points = np.array([[p['x'], p['y']] for p in pred['points']], dtype=np.int32)
-        cv2.fillPoly(log_mask, [points], 255)
-
-    # Draw defect polygons
-    for pred in defect_result.get("predictions", []):
-        points = np.array([[p['x'], p['y']] for p in pred['points']], dtype=np.int32)
-        cv2.fillPoly(defect_mask, [points], 255)
-
-    # Area calculations
-    total_log_area = int(np.sum(log_mask > 0))
-    defect_area = int(np.sum(defect_mask > 0))
-    defect_ratio = (defect_area / total_log_area) * 100 if total_log_area > 0 else 0
-
-    # Visualization
-    overlay = image_rgb.copy()
-    log_color = np.zeros_like(image_rgb)
-    defect_color = np.zeros_like(image_rgb)
-    log_color[log_mask > 0] = [0, 255, 255]
-    defect_color[defect_mask > 0] = [255, 0, 255]
-
-    overlay = cv2.addWeighted(overlay, 1, log_color, 0.5, 0)
-    overlay = cv2.addWeighted(overlay, 1, defect_color, 0.5, 0)
-
-    # Plot using matplotlib
-    fig, axs = plt.subplots(1, 2, figsize=(16, 8))
-    axs[0].imshow(image_rgb)
-    axs[0].set_title("Original Image")
-    axs[0].axis('off')
-
-    axs[1].imshow(overlay)
-    axs[1].set_title(f"Overlay - Defect Ratio: {defect_ratio:.2f}%")
-    axs[1].axis('off')
-
-    # Save to buffer
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format="png")
-    plt.close(fig)
-    buf.seek(0)
-    image_blob = base64.b64encode(buf.getvalue()).decode("utf-8")
-
+async def analyze_defect(
+    request: Request,
+    file: UploadFile = File(...),
+    backend: InferenceBackend = Depends(get_inference_backend),
+    visualize: bool = Query(True, description="False returns the numbers only"),
+    output: OutputMode = Query("inline", description="How image_blob is delivered"),
+    format: Literal["png", "jpeg"] = Query("png", description="Encoding of image_blob"),
+    quality: int = Query(90, ge=1, le=100, description="JPEG quality"),
+    renderer: Optional[Literal["fast", "matplotlib"]] = Query(
+        None, description="Overrides the IMAGE_RENDERER setting"
+    ),
+):
+    # Size, format and pixel count are checked from the header before reading
+    image_bytes = await read_image_upload(file)
+
+    payload, images = await run_defect_analysis(
+        image_bytes, backend, visualize, format, quality, renderer
+    )
+    return await build_image_response(request, output, payload, images)
+
+
+@router.get("/image/stats")
+async def image_stats(backend: InferenceBackend = Depends(get_inference_backend)):
+    """Runtime counters of the image pipelines"""
     return {
-        "total_log_area": total_log_area,
-        "defect_area": defect_area,
-        "defect_ratio": round(defect_ratio, 2),
-        "image_blob": image_blob
-    }
\ No newline at end of file
+        "executor": get_image_pool().stats(),
+        "memory_mb": process_memory(),
+        "artifacts": get_artifact_store().stats(),
+        "inference_backend": backend.stats(),
+        "inference_cache": backend.cache.stats() if backend.cache else None,
+    }
+
+
+@router.get("/image/artifacts/{artifact_id}", name="get_artifact")
+async def get_artifact(artifact_id: str):
+    """Serve an image stored by `?output=url`, until it expires"""
+    found = get_artifact_store().get(artifact_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Artifact not found or expired")
+    path, media_type = found
+    return FileResponse(path, media_type=media_type)
@@ -0,0 +1,113 @@
+import os
+import re
+import secrets
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from ...core.config import settings
+
+# Extensions the store accepts, with the MIME type they are served as
+ARTIFACT_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}\.(png|jpeg)$")
+
+# A temp file older than this is left over from a crashed write
+_TMP_MAX_AGE_SECONDS = 3600
+
+
+class ArtifactStore:
+    """
+    Short-lived image outputs on local disk, served by id instead of being
+    inlined as base64. Ids are unguessable tokens; a file's mtime is set
+    to its expiry time, so no index is kept, artifacts can live for
+    different times, and several workers sharing `directory` see the same
+    artifacts.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float, sweep_seconds: float = 60):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.sweep_seconds = sweep_seconds
+        self._last_sweep = 0.0
+        self.stored = 0
+        self.expired = 0
+
+    def put(self, data: bytes, fmt: str, ttl_seconds: Optional[float] = None) -> str:
+        """
+        Write `data` and return its artifact id; it is kept for
+        `ttl_seconds`, the store's TTL by default
+        """
+        if fmt not in ARTIFACT_TYPES:
+            raise ValueError(f"Unknown artifact format '{fmt}'")
+        self._maybe_sweep()
+        artifact_id = f"{secrets.token_urlsafe(24)}.{fmt}"
+        path = self.directory / artifact_id
+        tmp = path.with_name(f".{artifact_id}.tmp")
+        tmp.write_bytes(data)
+        expires_at = time.time() + (
+            self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        )
+        os.utime(tmp, (expires_at, expires_at))
+        os.replace(tmp, path)
+        self.stored += 1
+        return artifact_id
+
+    def get(self, artifact_id: str) -> Optional[Tuple[Path, str]]:
+        """Path and MIME type of a live artifact, or None if unknown/expired"""
+        if not _ID_PATTERN.match(artifact_id):
+            return None
+        path = self.directory / artifact_id
+        try:
+            expires_at = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if expires_at < time.time():
+            path.unlink(missing_ok=True)
+            self.expired += 1
+            return None
+        return path, ARTIFACT_TYPES[path.suffix[1:]]
+
+    def sweep(self) -> int:
+        """Delete every expired artifact; returns how many were removed"""
+        now = time.time()
+        removed = 0
+        for path in self.directory.iterdir():
+            # A temp file's mtime is its write time until `put` sets the
+            # expiry and renames it, so it may belong to a write in progress
+            is_tmp = path.name.startswith(".") and path.name.endswith(".tmp")
+            cutoff = now - _TMP_MAX_AGE_SECONDS if is_tmp else now
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        self.expired += removed
+        return removed
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_seconds:
+            self._last_sweep = now
+            self.sweep()
+
+    def stats(self) -> dict:
+        return {
+            "directory": str(self.directory),
+            "ttl_seconds": self.ttl_seconds,
+            "stored": self.stored,
+            "expired": self.expired,
+        }
+
+
+_store: Optional[ArtifactStore] = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Process-wide store, created on first use from the `artifact_*` settings"""
+    global _store
+    if _store is None:
+        _store = ArtifactStore(settings.artifact_dir, settings.artifact_ttl_seconds)
+    return _store
@@ -0,0 +1,154 @@
+import io
+import zipfile
+from dataclasses import dataclass, field
+from typing import IO, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, UploadFile
+
+# Archive members with these extensions are analyzed, everything else skipped
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+
+@dataclass
+class BatchItem:
+    """One image of a batch; `read` loads its bytes (blocking, run it off-loop)"""
+
+    index: int
+    filename: str
+    read: Callable[[], bytes]
+
+
+def _is_zip(upload: UploadFile) -> bool:
+    return (upload.filename or "").lower().endswith(".zip") or upload.content_type in (
+        "application/zip",
+        "application/x-zip-compressed",
+    )
+
+
+def _read_all(f: IO[bytes], max_bytes: int) -> Callable[[], bytes]:
+    def read() -> bytes:
+        # Checked before loading it, like archive members
+        if f.seek(0, io.SEEK_END) > max_bytes:
+            raise HTTPException(status_code=413, detail="Image too large")
+        f.seek(0)
+        return f.read()
+
+    return read
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, max_bytes: int):
+    def read() -> bytes:
+        # Checked against the header before inflating anything (zip bombs)
+        if info.file_size > max_bytes:
+            raise HTTPException(status_code=413, detail="Image too large")
+        return archive.read(info)
+
+    return read
+
+
+def collect_items(
+    uploads: List[UploadFile], max_files: int, max_file_bytes: int
+) -> Tuple[List[BatchItem], List[IO[bytes]]]:
+    """
+    Expand uploads (plain images or zip archives) into batch items.
+
+    FastAPI closes form files as soon as the endpoint returns, before a
+    streamed response is consumed, so the spooled files are taken over
+    here and handed back for the caller to close when it is done.
+    Returns `(items, files)`.
+    """
+    items: List[BatchItem] = []
+    files: List[IO[bytes]] = []
+    try:
+        for upload in uploads:
+            f, upload.file = upload.file, io.BytesIO()
+            files.append(f)
+            if _is_zip(upload):
+                items.extend(_zip_items(f, upload.filename, len(items), max_file_bytes))
+            else:
+                name = upload.filename or f"image-{len(items)}"
+                items.append(BatchItem(len(items), name, _read_all(f, max_file_bytes)))
+            if len(items) > max_files:
+                raise HTTPException(
+                    status_code=413, detail=f"At most {max_files} images per batch"
+                )
+        if not items:
+            raise HTTPException(status_code=400, detail="No images in the batch")
+    except BaseException:
+        close_files(files)
+        raise
+    return items, files
+
+
+def _zip_items(f: IO[bytes], filename: Optional[str], start: int, max_file_bytes: int):
+    try:
+        archive = zipfile.ZipFile(f)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive: {filename}")
+    members = [
+        info
+        for info in archive.infolist()
+        if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    return [
+        BatchItem(start + i, info.filename, _read_member(archive, info, max_file_bytes))
+        for i, info in enumerate(members)
+    ]
+
+
+def close_files(files: List[IO[bytes]]):
+    for f in files:
+        f.close()
+
+
+def _distribution(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=float)
+    q1, median, q3 = np.percentile(arr, [25, 50, 75])
+    return {
+        "mean": round(float(arr.mean()), 2),
+        "min": round(float(arr.min()), 2),
+        "Q1": round(float(q1), 2),
+        "median": round(float(median), 2),
+        "Q3": round(float(q3), 2),
+        "max": round(float(arr.max()), 2),
+    }
+
+
+@dataclass
+class BatchStats:
+    """Running aggregates of a batch, updated as each image finishes"""
+
+    total: int
+    succeeded: int = 0
+    failed: int = 0
+    errors: Dict[int, int] = field(default_factory=dict)
+    values: Dict[str, List[float]] = field(default_factory=dict)
+
+    def add_error(self, status_code: int):
+        self.failed += 1
+        self.errors[status_code] = self.errors.get(status_code, 0) + 1
+
+    def add(self, result: dict, keys: tuple):
+        self.succeeded += 1
+        for key in keys:
+            self.values.setdefault(key, []).append(result[key])
+
+    def summary(self) -> dict:
+        summary = {
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "errors_by_status": {str(k): v for k, v in sorted(self.errors.items())},
+        }
+        for key, values in self.values.items():
+            summary[key] = _distribution(values)
+        return summary
+
+
+def ring_count_histogram(mean_counts: List[float]) -> Dict[str, int]:
+    """How many logs have each (rounded) ring count"""
+    counts = np.bincount(np.rint(mean_counts).astype(int)) if mean_counts else []
+    return {str(rings): int(n) for rings, n in enumerate(counts) if n}
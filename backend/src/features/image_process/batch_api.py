@@ -0,0 +1,169 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable, List, Literal, Tuple
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from ...core.config import settings
+from .api import run_defect_analysis
+from .batch import (
+    BatchItem,
+    BatchStats,
+    close_files,
+    collect_items,
+    ring_count_histogram,
+)
+from .inference_backends import InferenceBackend, get_inference_backend
+from .outputs import Images, build_image_response
+from .ring_count_api import run_ring_count
+from .uploads import BatchUploadRoute, check_image_bytes
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=BatchUploadRoute)
+
+# Per-image pipeline: (bytes, filename) -> (payload, images)
+Pipeline = Callable[[bytes, str], Awaitable[Tuple[dict, Images]]]
+
+
+def _ndjson(obj) -> bytes:
+    return (json.dumps(jsonable_encoder(obj)) + "\n").encode()
+
+
+async def _stream_batch(
+    request: Request,
+    items: List[BatchItem],
+    files: list,
+    pipeline: Pipeline,
+    output: str,
+    stats: BatchStats,
+    summary_keys: tuple,
+):
+    """
+    Run `pipeline` over `items` with at most `batch_concurrency` images in
+    flight and yield one NDJSON line per image as it finishes (completion
+    order, not upload order), then a final summary line.
+    """
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+    started = time.perf_counter()
+
+    async def process(item: BatchItem) -> dict:
+        line = {"index": item.index, "filename": item.filename}
+        async with semaphore:
+            try:
+                image_bytes = await asyncio.to_thread(item.read)
+                check_image_bytes(image_bytes, settings.batch_max_file_bytes)
+                payload, images = await pipeline(image_bytes, item.filename)
+                del image_bytes
+                result = await build_image_response(request, output, payload, images)
+            except HTTPException as e:
+                stats.add_error(e.status_code)
+                return {
+                    **line,
+                    "status": "error",
+                    "status_code": e.status_code,
+                    "error": e.detail,
+                }
+            except Exception as e:
+                logger.exception("Batch item %s failed", item.filename)
+                stats.add_error(500)
+                return {**line, "status": "error", "status_code": 500, "error": str(e)}
+        stats.add(result, summary_keys)
+        return {**line, "status": "ok", "result": result}
+
+    tasks = [asyncio.create_task(process(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield _ndjson(await next_done)
+        summary = stats.summary()
+        summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        yield _ndjson({"summary": summary})
+    finally:
+        # Client went away or the batch finished: stop what is still queued
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        close_files(files)
+
+
+def _batch_response(
+    request, uploads, pipeline, output, summary_keys, stats_class=BatchStats
+):
+    items, files = collect_items(
+        uploads, settings.batch_max_files, settings.batch_max_file_bytes
+    )
+    stats = stats_class(total=len(items))
+    return StreamingResponse(
+        _stream_batch(request, items, files, pipeline, output, stats, summary_keys),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post("/analyze/batch")
+async def analyze_defect_batch(
+    request: Request,
+    files: List[UploadFile] = File(
+        ..., description="Images and/or zip archives of images"
+    ),
+    backend: InferenceBackend = Depends(get_inference_backend),
+    visualize: bool = Query(False, description="Also render each overlay"),
+    output: Literal["inline", "url"] = Query(
+        "url", description="How overlays are delivered"
+    ),
+    format: Literal["png", "jpeg"] = Query(
+        "jpeg", description="Encoding of image_blob"
+    ),
+    quality: int = Query(85, ge=1, le=100, description="JPEG quality"),
+):
+    """Defect analysis of many images, streamed back as NDJSON"""
+
+    async def pipeline(image_bytes: bytes, filename: str):
+        return await run_defect_analysis(
+            image_bytes, backend, visualize, format, quality
+        )
+
+    return _batch_response(
+        request, files, pipeline, output, ("defect_ratio", "defect_in_log_ratio")
+    )
+
+
+class RingCountBatchStats(BatchStats):
+    """Adds how many logs have each ring count to the summary"""
+
+    def summary(self) -> dict:
+        summary = super().summary()
+        summary["ring_count_histogram"] = ring_count_histogram(
+            self.values.get("mean_ring_count", [])
+        )
+        return summary
+
+
+@router.post("/ring-count/batch")
+async def analyze_ring_count_batch(
+    request: Request,
+    files: List[UploadFile] = File(
+        ..., description="Images and/or zip archives of images"
+    ),
+    backend: InferenceBackend = Depends(get_inference_backend),
+    visualize: bool = Query(False, description="Also render the figures"),
+    output: Literal["inline", "url"] = Query(
+        "url", description="How figures are delivered"
+    ),
+):
+    """Ring counts of many images, streamed back as NDJSON"""
+
+    async def pipeline(image_bytes: bytes, filename: str):
+        return await run_ring_count(image_bytes, filename, backend, visualize)
+
+    return _batch_response(
+        request,
+        files,
+        pipeline,
+        output,
+        ("mean_ring_count",),
+        stats_class=RingCountBatchStats,
+    )
@@ -0,0 +1,101 @@
+import io
+
+import cv2
+import numpy as np
+from matplotlib.figure import Figure
+
+from .masks import display_overlay, fill_polygons, mask_areas, polygons_from_predictions
+from .render import PANEL_MAX_SIDE, compose_panels, encode_image
+from .timing import StageTimer
+
+
+def decode_image(image_bytes: bytes):
+    np_arr = np.frombuffer(image_bytes, np.uint8)
+    return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+
+
+def render_matplotlib(image, overlay, defect_ratio: float, fmt: str, quality: int) -> bytes:
+    """The original 16x8-inch two-subplot figure"""
+    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    overlay = cv2.cvtColor(overlay, cv2.COLOR_BGR2RGB)
+
+    # Plot with matplotlib's object API (pyplot's global state is not thread-safe)
+    fig = Figure(figsize=(16, 8))
+    axs = fig.subplots(1, 2)
+    axs[0].imshow(image_rgb)
+    axs[0].set_title("Original Image")
+    axs[0].axis('off')
+
+    axs[1].imshow(overlay)
+    axs[1].set_title(f"Overlay - Defect Ratio: {defect_ratio:.2f}%")
+    axs[1].axis('off')
+
+    # Save to buffer
+    buf = io.BytesIO()
+    fig.tight_layout()
+    if fmt == "jpeg":
+        fig.savefig(buf, format="jpeg", pil_kwargs={"quality": quality})
+    else:
+        fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def render_fast(image, overlay, defect_ratio: float, fmt: str, quality: int) -> bytes:
+    """Same layout composed directly with NumPy/OpenCV, no Matplotlib"""
+    canvas = compose_panels(
+        [
+            (image, "Original Image"),
+            (overlay, f"Overlay - Defect Ratio: {defect_ratio:.2f}%"),
+        ]
+    )
+    return encode_image(canvas, fmt, quality)
+
+
+RENDERERS = {"fast": render_fast, "matplotlib": render_matplotlib}
+
+
+def render_defect_analysis(
+    image,
+    log_surface_result: dict,
+    defect_result: dict,
+    renderer: str = "fast",
+    fmt: str = "png",
+    quality: int = 90,
+    visualize: bool = True,
+) -> dict:
+    """
+    Masks, areas and the side-by-side visualization for /analyze.
+    Images stay BGR throughout; only the Matplotlib renderer converts.
+    Pure and module-level so it can run on a thread or process pool.
+    The encoded figure is returned as raw bytes under `images`; with
+    `visualize=False` only the numbers are computed.
+    """
+    timer = StageTimer()
+
+    with timer.stage("masks"):
+        log_mask = fill_polygons(image.shape, polygons_from_predictions(log_surface_result))
+        defect_mask = fill_polygons(image.shape, polygons_from_predictions(defect_result))
+
+        areas = mask_areas(log_mask, defect_mask)
+        total_log_area = areas["total_log_area"]
+        defect_ratio = (areas["defect_area"] / total_log_area) * 100 if total_log_area > 0 else 0
+        # Share of the log surface actually covered by defects
+        defect_in_log_ratio = (
+            (areas["defect_in_log_area"] / total_log_area) * 100 if total_log_area > 0 else 0
+        )
+
+    images = {}
+    if visualize:
+        with timer.stage("render"):
+            # Both renderers show the panels at most PANEL_MAX_SIDE wide
+            image, overlay = display_overlay(image, log_mask, defect_mask, PANEL_MAX_SIDE)
+            encoded = RENDERERS[renderer](image, overlay, defect_ratio, fmt, quality)
+            images["image_blob"] = (encoded, fmt)
+
+    return {
+        **areas,
+        "defect_ratio": round(defect_ratio, 2),
+        "defect_in_log_ratio": round(defect_in_log_ratio, 2),
+        "images": images,
+        "timings_ms": timer.timings,
+    }
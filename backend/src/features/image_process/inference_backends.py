@@ -0,0 +1,141 @@
+import asyncio
+import base64
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.requests import Request
+
+from ...core.config import settings
+from .inference_cache import InferenceCache, image_digest
+from .preprocess import ModelUpload, rescale_predictions
+from .roboflow_client import RoboflowClient
+
+ROBOFLOW_API_URL = "https://serverless.roboflow.com"
+ROBOFLOW_DETECT_URL = "https://detect.roboflow.com"
+# Served by the detect API as a multipart upload; other models go to the
+# serverless API as base64
+ROBOFLOW_DETECT_MODELS = {"pith-annotation-of-timber/1"}
+
+
+class InferenceBackend(ABC):
+    """
+    Runs the vision models of the image pipelines. Every backend returns
+    Roboflow's response shape (`predictions` with `x`, `y`, `width`,
+    `height`, `confidence`, `class` and, for segmentation, `points`) in
+    original-image pixels. Responses are cached by image content (see
+    `infer`); subclasses implement `predict`.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.cache = InferenceCache.from_settings()
+
+    def variant(self, model_id: str, upload: ModelUpload) -> str:
+        """Suffix of the cache key: responses of different setups never mix"""
+        return ""
+
+    @abstractmethod
+    async def predict(
+        self, model_id: str, upload: ModelUpload, filename: Optional[str] = None
+    ) -> dict:
+        """Predictions of `model_id` for the uploaded image, uncached"""
+
+    async def digest(self, image_bytes: bytes) -> Optional[str]:
+        """Cache key of an image, or None when caching is off"""
+        if self.cache is None:
+            return None
+        # hashlib releases the GIL on large buffers
+        return await asyncio.to_thread(image_digest, image_bytes)
+
+    async def infer(
+        self,
+        model_id: str,
+        digest: Optional[str],
+        upload: ModelUpload,
+        filename: Optional[str] = None,
+    ) -> dict:
+        """
+        Response of `model_id` for the uploaded image, served from the
+        inference cache when possible. Failed predictions raise and are
+        never cached.
+        """
+
+        async def fetch():
+            return await self.predict(model_id, upload, filename)
+
+        if self.cache is None or digest is None:
+            return await fetch()
+        key = model_id + self.variant(model_id, upload)
+        return await self.cache.get_or_fetch(digest, key, fetch)
+
+    def stats(self) -> dict:
+        return {"name": self.name}
+
+    async def aclose(self):
+        if self.cache is not None:
+            self.cache.close()
+
+
+class RoboflowBackend(InferenceBackend):
+    """
+    Hosted Roboflow models over the shared HTTP client. The downscaled
+    upload is sent and the coordinates mapped back to the original.
+    """
+
+    name = "roboflow"
+
+    def __init__(self, client: RoboflowClient):
+        super().__init__()
+        self.client = client
+
+    def variant(self, model_id: str, upload: ModelUpload) -> str:
+        return upload.variant
+
+    async def predict(
+        self, model_id: str, upload: ModelUpload, filename: Optional[str] = None
+    ) -> dict:
+        data, scale, size = await upload.get()
+        params = {"api_key": settings.roboflow_api_key}
+        if model_id in ROBOFLOW_DETECT_MODELS:
+            response = await self.client.post(
+                f"{ROBOFLOW_DETECT_URL}/{model_id}",
+                params=params,
+                files={"file": (filename, data)},
+            )
+            if response.status_code != 200:
+                raise HTTPException(status_code=500, detail="Roboflow API failed")
+        else:
+            response = await self.client.post(
+                f"{ROBOFLOW_API_URL}/{model_id}",
+                params=params,
+                content=base64.b64encode(data).decode("utf-8"),
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+            )
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=response.status_code, detail=response.text
+                )
+        return rescale_predictions(response.json(), scale, size)
+
+    async def aclose(self):
+        await self.client.aclose()
+        await super().aclose()
+
+
+def create_inference_backend() -> InferenceBackend:
+    """The backend selected by the INFERENCE_BACKEND setting"""
+    if settings.inference_backend == "roboflow":
+        return RoboflowBackend(RoboflowClient())
+    if settings.inference_backend == "onnx":
+        # Imported here so onnxruntime stays optional for Roboflow setups
+        from .onnx_backend import OnnxBackend
+
+        return OnnxBackend(settings.onnx_model_dir)
+    raise ValueError(f"Unknown inference backend '{settings.inference_backend}'")
+
+
+def get_inference_backend(request: Request) -> InferenceBackend:
+    """Dependency to get the shared inference backend from app state"""
+    return request.app.state.inference_backend
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from ...core.config import settings
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """SHA-256 of the uploaded bytes; identical re-uploads share it"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class SQLiteInferenceStore:
+    """
+    On-disk tier: model responses as JSON in a single SQLite file, keyed
+    by image digest + model id. Several processes can share the file
+    (WAL mode); the oldest rows are pruned past `max_entries`.
+    """
+
+    _PRUNE_EVERY = 200
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS inference ("
+            " digest TEXT NOT NULL, model_id TEXT NOT NULL,"
+            " created_at REAL NOT NULL, response TEXT NOT NULL,"
+            " PRIMARY KEY (digest, model_id))"
+        )
+        self._conn.commit()
+
+    def get(self, digest: str, model_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, response FROM inference"
+                " WHERE digest = ? AND model_id = ?",
+                (digest, model_id),
+            ).fetchone()
+        if row is None or time.time() - row[0] > self.ttl_seconds:
+            return None
+        return json.loads(row[1])
+
+    def set(self, digest: str, model_id: str, response: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO inference (digest, model_id, created_at, response)"
+                " VALUES (?, ?, ?, ?)",
+                (digest, model_id, time.time(), json.dumps(response)),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes >= self._PRUNE_EVERY:
+                self._writes = 0
+                self._prune()
+
+    def _prune(self):
+        self._conn.execute(
+            "DELETE FROM inference WHERE created_at < ?",
+            (time.time() - self.ttl_seconds,),
+        )
+        self._conn.execute(
+            "DELETE FROM inference WHERE rowid NOT IN ("
+            " SELECT rowid FROM inference ORDER BY created_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class InferenceCache:
+    """
+    Two-tier cache of Roboflow responses keyed by (image digest, model id):
+    an in-memory LRU in front of an optional SQLite file, both with a TTL.
+    Concurrent misses for the same key share one upstream call. Only
+    successful responses are cached; errors propagate and are retried.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        disk: Optional[SQLiteInferenceStore] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk = disk
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[float, dict]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls) -> Optional["InferenceCache"]:
+        if not settings.inference_cache_enabled:
+            return None
+        disk = None
+        if settings.inference_cache_path:
+            disk = SQLiteInferenceStore(
+                settings.inference_cache_path,
+                settings.inference_cache_ttl_seconds,
+                settings.inference_cache_max_disk_entries,
+            )
+        return cls(
+            settings.inference_cache_max_entries,
+            settings.inference_cache_ttl_seconds,
+            disk,
+        )
+
+    def _memory_get(self, key: Tuple[str, str]) -> Optional[dict]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        stored_at, response = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return response
+
+    def _memory_set(self, key: Tuple[str, str], response: dict):
+        self._memory[key] = (time.monotonic(), response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get_or_fetch(
+        self, digest: str, model_id: str, fetch: Callable[[], Awaitable[dict]]
+    ) -> dict:
+        """Cached response for (`digest`, `model_id`), calling `fetch` on a miss"""
+        key = (digest, model_id)
+        response = self._memory_get(key)
+        if response is not None:
+            self.memory_hits += 1
+            return response
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Only swallow the leader's cancellation, never our own
+                if not inflight.cancelled():
+                    raise
+            self.coalesced -= 1
+        return await self._fetch(key, fetch)
+
+    async def _fetch(self, key: Tuple[str, str], fetch) -> dict:
+        digest, model_id = key
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = None
+            if self.disk is not None:
+                response = await asyncio.to_thread(self.disk.get, digest, model_id)
+            if response is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                response = await fetch()
+                if self.disk is not None:
+                    await asyncio.to_thread(self.disk.set, digest, model_id, response)
+            self._memory_set(key, response)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody waited on isn't logged
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits + self.coalesced
+        lookups = hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
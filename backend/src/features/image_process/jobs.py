@@ -0,0 +1,285 @@
+import asyncio
+import ipaddress
+import logging
+import secrets
+import socket
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from ...core.concurrency import QueueFullError
+from .outputs import Images, store_images
+
+logger = logging.getLogger(__name__)
+
+# kind -> coroutine(image_bytes, filename, params) -> (payload, images)
+JobHandler = Callable[[bytes, str, dict], Awaitable[Tuple[dict, Images]]]
+
+
+class CallbackURLError(ValueError):
+    """Raised for a callback URL the server must not send requests to"""
+
+
+async def check_callback_url(url: str, allowed_hosts: Sequence[str] = ()):
+    """
+    Refuse callback URLs that would let a client make this server call
+    internal services: with `allowed_hosts` set the host must be one of
+    them, otherwise every address it resolves to must be public (no
+    loopback, private, link-local, reserved or multicast ranges, which
+    covers cloud metadata endpoints).
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise CallbackURLError("Callback URL must be an absolute http(s) URL")
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise CallbackURLError(f"Callback host '{host}' is not allowed")
+        return
+
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+    except socket.gaierror:
+        raise CallbackURLError(f"Callback host '{host}' does not resolve")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if getattr(address, "ipv4_mapped", None):
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise CallbackURLError(
+                f"Callback host '{host}' resolves to a non-public address"
+            )
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    filename: str
+    params: dict
+    url_prefix: str
+    callback_url: Optional[str] = None
+    image_bytes: Optional[bytes] = field(default=None, repr=False)
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[dict] = None
+    callback: Optional[dict] = None
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "filename": self.filename,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        if self.callback is not None:
+            data["callback"] = self.callback
+        return data
+
+
+class JobQueue:
+    """
+    In-process queue for image analyses that outlive their HTTP request.
+    Submitting returns at once; `workers` background tasks run the jobs
+    through the registered handlers, store images as artifacts and keep
+    the record for `ttl_seconds` after it finishes. Optionally the record
+    is POSTed to a callback URL when the job is done (see
+    `check_callback_url`; redirects are not followed).
+
+    Queued jobs hold their image in memory, so besides `max_queue` the
+    queue is bounded by `max_queued_bytes` of images waiting.
+
+    State lives in this process: with several server workers, a job can
+    only be polled on the worker that accepted it.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, JobHandler],
+        workers: int,
+        max_queue: int,
+        ttl_seconds: float,
+        callback_timeout_seconds: float = 10.0,
+        max_queued_bytes: Optional[int] = None,
+        artifact_ttl_seconds: Optional[float] = None,
+        callback_allowed_hosts: Sequence[str] = (),
+    ):
+        self.handlers = handlers
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl_seconds = ttl_seconds
+        self.callback_timeout_seconds = callback_timeout_seconds
+        self.max_queued_bytes = max_queued_bytes
+        # Result images must outlive the record that links to them
+        self.artifact_ttl_seconds = artifact_ttl_seconds
+        self.callback_allowed_hosts = tuple(callback_allowed_hosts)
+        self.queued_bytes = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._callback_client: Optional[httpx.AsyncClient] = None
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def start(self):
+        self._callback_client = httpx.AsyncClient(
+            timeout=self.callback_timeout_seconds, follow_redirects=False
+        )
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"image-job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._callback_client is not None:
+            await self._callback_client.aclose()
+
+    def submit(
+        self,
+        kind: str,
+        image_bytes: bytes,
+        filename: str,
+        params: dict,
+        url_prefix: str,
+        callback_url: Optional[str] = None,
+    ) -> Job:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        self._purge_expired()
+        if self._queue.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"{self._queue.qsize()} image jobs already queued")
+        if (
+            self.max_queued_bytes is not None
+            and self.queued_bytes + len(image_bytes) > self.max_queued_bytes
+        ):
+            self.rejected += 1
+            raise QueueFullError(
+                f"{self.queued_bytes / 1024 / 1024:.0f} MiB of images already queued"
+            )
+
+        job = Job(
+            id=secrets.token_urlsafe(16),
+            kind=kind,
+            filename=filename,
+            params=params,
+            url_prefix=url_prefix,
+            callback_url=callback_url,
+            image_bytes=image_bytes,
+        )
+        self._jobs[job.id] = job
+        self.queued_bytes += len(image_bytes)
+        self._queue.put_nowait(job)
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception:
+                logger.exception("Image job %s crashed", job.id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        image_bytes, job.image_bytes = job.image_bytes, None
+        self.queued_bytes -= len(image_bytes)
+        try:
+            payload, images = await self.handlers[job.kind](
+                image_bytes, job.filename, job.params
+            )
+            del image_bytes
+            job.result = await store_images(
+                payload, images, job.url_prefix, self.artifact_ttl_seconds
+            )
+            job.status = "succeeded"
+            self.succeeded += 1
+        except HTTPException as e:
+            job.error = {"status_code": e.status_code, "detail": e.detail}
+            job.status = "failed"
+            self.failed += 1
+        except Exception as e:
+            logger.exception("Image job %s failed", job.id)
+            job.error = {"status_code": 500, "detail": str(e)}
+            job.status = "failed"
+            self.failed += 1
+        finally:
+            job.finished_at = time.time()
+
+        if job.callback_url:
+            await self._send_callback(job)
+
+    async def _send_callback(self, job: Job):
+        try:
+            # Checked again: the host may resolve differently by now
+            await check_callback_url(job.callback_url, self.callback_allowed_hosts)
+        except CallbackURLError as e:
+            logger.warning("Callback for image job %s refused: %s", job.id, e)
+            job.callback = {"error": str(e)}
+            return
+        try:
+            response = await self._callback_client.post(
+                job.callback_url, json=jsonable_encoder(job.to_dict())
+            )
+            job.callback = {"status_code": response.status_code}
+        except httpx.HTTPError as e:
+            logger.warning("Callback for image job %s failed: %s", job.id, e)
+            job.callback = {"error": str(e) or type(e).__name__}
+
+    def stats(self) -> dict:
+        by_status: Dict[str, int] = {}
+        for job in self._jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "queued_bytes": self.queued_bytes,
+            "tracked": by_status,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
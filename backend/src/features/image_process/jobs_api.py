@@ -0,0 +1,141 @@
+from typing import Literal, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
+from fastapi.responses import JSONResponse
+from pydantic import AnyHttpUrl
+
+from ...core.concurrency import QueueFullError
+from ...core.config import settings
+from .api import run_defect_analysis
+from .inference_backends import InferenceBackend
+from .jobs import CallbackURLError, JobQueue, check_callback_url
+from .outputs import artifact_url_prefix
+from .ring_count_api import run_ring_count
+from .uploads import ImageUploadRoute, read_image_upload
+
+router = APIRouter(route_class=ImageUploadRoute)
+
+
+def create_job_queue(backend: InferenceBackend) -> JobQueue:
+    """Job queue wired to the /analyze and /ring-count pipelines"""
+
+    async def analyze(image_bytes: bytes, filename: str, params: dict):
+        return await run_defect_analysis(image_bytes, backend, **params)
+
+    async def ring_count(image_bytes: bytes, filename: str, params: dict):
+        return await run_ring_count(image_bytes, filename, backend, **params)
+
+    return JobQueue(
+        handlers={"analyze": analyze, "ring-count": ring_count},
+        workers=settings.job_workers,
+        max_queue=settings.job_max_queue,
+        ttl_seconds=settings.job_ttl_seconds,
+        callback_timeout_seconds=settings.job_callback_timeout_seconds,
+        max_queued_bytes=settings.job_max_queued_bytes,
+        # Images are stored just before a job finishes; the slack keeps them
+        # alive until the record that links them expires
+        artifact_ttl_seconds=max(
+            settings.job_ttl_seconds + 60, settings.artifact_ttl_seconds
+        ),
+        callback_allowed_hosts=callback_allowed_hosts(),
+    )
+
+
+def callback_allowed_hosts() -> list:
+    """Hosts of the JOB_CALLBACK_ALLOWED_HOSTS setting, lower-cased"""
+    return [
+        host.strip().lower()
+        for host in settings.job_callback_allowed_hosts.split(",")
+        if host.strip()
+    ]
+
+
+def get_job_queue(request: Request) -> JobQueue:
+    """Dependency to get the image job queue from app state"""
+    return request.app.state.job_queue
+
+
+async def _submit(request, queue, kind, file, params, callback_url) -> JSONResponse:
+    # Rejected before queueing, not when a worker gets to it
+    if callback_url:
+        try:
+            await check_callback_url(str(callback_url), queue.callback_allowed_hosts)
+        except CallbackURLError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    image_bytes = await read_image_upload(file)
+    try:
+        job = queue.submit(
+            kind,
+            image_bytes,
+            file.filename or "image",
+            params,
+            artifact_url_prefix(request),
+            str(callback_url) if callback_url else None,
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": "5"}
+        )
+
+    status_url = str(request.url_for("get_image_job", job_id=job.id))
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": job.status, "status_url": status_url},
+        headers={"Location": status_url},
+    )
+
+
+@router.post("/jobs/analyze", status_code=202)
+async def submit_analyze_job(
+    request: Request,
+    file: UploadFile = File(...),
+    callback_url: Optional[AnyHttpUrl] = Form(
+        None, description="POSTed the job record when done"
+    ),
+    queue: JobQueue = Depends(get_job_queue),
+    visualize: bool = Query(True, description="False returns the numbers only"),
+    format: Literal["png", "jpeg"] = Query("png", description="Encoding of image_blob"),
+    quality: int = Query(90, ge=1, le=100, description="JPEG quality"),
+):
+    """Queue a defect analysis; poll `status_url` or wait for the callback"""
+    params = {"visualize": visualize, "fmt": format, "quality": quality}
+    return await _submit(request, queue, "analyze", file, params, callback_url)
+
+
+@router.post("/jobs/ring-count", status_code=202)
+async def submit_ring_count_job(
+    request: Request,
+    file: UploadFile = File(...),
+    callback_url: Optional[AnyHttpUrl] = Form(
+        None, description="POSTed the job record when done"
+    ),
+    queue: JobQueue = Depends(get_job_queue),
+    visualize: bool = Query(True, description="False returns the numbers only"),
+):
+    """Queue a ring count; poll `status_url` or wait for the callback"""
+    return await _submit(
+        request, queue, "ring-count", file, {"visualize": visualize}, callback_url
+    )
+
+
+@router.get("/jobs/stats")
+async def image_job_stats(queue: JobQueue = Depends(get_job_queue)):
+    return queue.stats()
+
+
+@router.get("/jobs/{job_id}", name="get_image_job")
+async def get_image_job(job_id: str, queue: JobQueue = Depends(get_job_queue)):
+    """Status of a job and, once it has finished, its result or error"""
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
@@ -0,0 +1,114 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from .render import fit_panel
+
+# Overlay tints, as the BGR values added where a mask is set: half of cyan
+# for the log surface and half of magenta for defects (50% additive blend)
+LOG_TINT = (128, 128, 0)
+DEFECT_TINT = (128, 0, 128)
+
+
+def polygons_from_predictions(result: dict) -> List[np.ndarray]:
+    """
+    All Roboflow polygon predictions of `result` as int32 point arrays.
+    The points of every prediction are read in one pass into a single
+    buffer and split afterwards, instead of one array per polygon.
+    """
+    preds = [p for p in result.get("predictions", []) if len(p.get("points", ())) >= 3]
+    if not preds:
+        return []
+    lengths = np.fromiter(
+        (len(p["points"]) for p in preds), dtype=np.intp, count=len(preds)
+    )
+    coords = np.fromiter(
+        (c for p in preds for pt in p["points"] for c in (pt["x"], pt["y"])),
+        dtype=np.float64,
+        count=int(lengths.sum()) * 2,
+    )
+    # Truncate like the original `np.array(..., dtype=np.int32)` did
+    points = coords.astype(np.int32).reshape(-1, 2)
+    return np.split(points, np.cumsum(lengths)[:-1])
+
+
+def _isolated(polygons: List[np.ndarray]) -> np.ndarray:
+    """Which polygons' bounding boxes overlap no other polygon's"""
+    boxes = np.array([(*p.min(axis=0), *p.max(axis=0)) for p in polygons])
+    x0, y0, x1, y1 = (boxes[:, i] for i in range(4))
+    overlap = (
+        (x0[:, None] <= x1[None, :])
+        & (x0[None, :] <= x1[:, None])
+        & (y0[:, None] <= y1[None, :])
+        & (y0[None, :] <= y1[:, None])
+    )
+    np.fill_diagonal(overlap, False)
+    return ~overlap.any(axis=1)
+
+
+def fill_polygons(shape, polygons: List[np.ndarray]) -> np.ndarray:
+    """
+    uint8 mask with every polygon filled with 255.
+    `cv2.fillPoly` fills several polygons with the even-odd rule, so
+    overlapping polygons would punch holes into each other. Polygons whose
+    bounding boxes touch no other are filled in one call; the (usually
+    few) overlapping ones are filled one by one, which unions them.
+    """
+    mask = np.zeros(shape[:2], dtype=np.uint8)
+    if not polygons:
+        return mask
+    isolated = _isolated(polygons) if len(polygons) > 1 else np.ones(1, dtype=bool)
+    batch = [p for p, alone in zip(polygons, isolated) if alone]
+    if batch:
+        cv2.fillPoly(mask, batch, 255)
+    for p, alone in zip(polygons, isolated):
+        if not alone:
+            cv2.fillPoly(mask, [p], 255)
+    return mask
+
+
+def mask_areas(log_mask: np.ndarray, defect_mask: np.ndarray) -> dict:
+    """Pixel areas counted on the uint8 masks directly"""
+    total_log_area = cv2.countNonZero(log_mask)
+    defect_area = cv2.countNonZero(defect_mask)
+    defect_in_log_area = cv2.countNonZero(cv2.bitwise_and(log_mask, defect_mask))
+    return {
+        "total_log_area": total_log_area,
+        "defect_area": defect_area,
+        "defect_in_log_area": defect_in_log_area,
+    }
+
+
+def blend_overlay(
+    image_bgr: np.ndarray, log_mask: np.ndarray, defect_mask: np.ndarray
+) -> np.ndarray:
+    """Copy of the image with both masks tinted in, without full-size color layers"""
+    overlay = image_bgr.copy()
+    cv2.add(overlay, LOG_TINT, dst=overlay, mask=log_mask)
+    cv2.add(overlay, DEFECT_TINT, dst=overlay, mask=defect_mask)
+    return overlay
+
+
+def display_overlay(
+    image_bgr: np.ndarray,
+    log_mask: np.ndarray,
+    defect_mask: np.ndarray,
+    max_side: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The image and its tinted overlay downscaled to at most `max_side`, for
+    renderers that never show more. Masks are area-averaged, so each tint
+    is added in proportion to how much of a display pixel it covers, as
+    if blended at full size and downscaled; no full-size copy is made.
+    """
+    small = fit_panel(image_bgr, max_side)
+    if small is image_bgr:
+        return image_bgr, blend_overlay(image_bgr, log_mask, defect_mask)
+    size = (small.shape[1], small.shape[0])
+    overlay = small.copy()
+    for mask, tint in ((log_mask, LOG_TINT), (defect_mask, DEFECT_TINT)):
+        coverage = cv2.resize(mask, size, interpolation=cv2.INTER_AREA)
+        layer = (coverage[..., None].astype(np.uint16) * tint + 127) // 255
+        cv2.add(overlay, layer.astype(np.uint8), dst=overlay)
+    return small, overlay
@@ -0,0 +1,117 @@
+import os
+import sys
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MB = 1024 * 1024
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (Linux only, else None)"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    """Highest resident set size this process ever reached, in bytes"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _mb(value: Optional[int]) -> Optional[float]:
+    return round(value / _MB, 1) if value is not None else None
+
+
+class _Sampler:
+    """
+    One background thread reading the RSS every `interval` seconds for
+    all running monitors; it exits once none is left. Monitors are held
+    weakly, so one abandoned by a failed request just drops out.
+    """
+
+    def __init__(self):
+        self._monitors: "weakref.WeakSet[PeakRSS]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, monitor: "PeakRSS"):
+        with self._lock:
+            self._monitors.add(monitor)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="rss-sampler", daemon=True
+                )
+                self._thread.start()
+
+    def discard(self, monitor: "PeakRSS"):
+        with self._lock:
+            self._monitors.discard(monitor)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                monitors = list(self._monitors)
+                if not monitors:
+                    self._thread = None
+                    return
+                interval = min(m.interval for m in monitors)
+            rss = current_rss()
+            for monitor in monitors:
+                monitor.observe(rss)
+            del monitors
+            time.sleep(interval)
+
+
+_sampler = _Sampler()
+
+
+class PeakRSS:
+    """
+    Highest RSS of the process seen while one request runs. RSS is
+    process-wide: concurrent requests raise each other's peaks, so this
+    is what the server held during the request (what pods are sized by),
+    not the request's own allocations. Process-pool workers are not
+    included. `interval_ms=0` turns sampling off.
+    """
+
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self.start_rss = current_rss() if interval_ms else None
+        self.peak = self.start_rss
+        if self.start_rss is not None:
+            _sampler.add(self)
+
+    def observe(self, rss: Optional[int]):
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def stop(self) -> Optional[Dict[str, Optional[float]]]:
+        """`rss_start`, `rss_peak` and `peak_increase` in MiB, or None"""
+        if self.start_rss is None:
+            return None
+        _sampler.discard(self)
+        self.observe(current_rss())
+        return {
+            "rss_start": _mb(self.start_rss),
+            "rss_peak": _mb(self.peak),
+            "peak_increase": _mb(self.peak - self.start_rss),
+        }
+
+
+def process_memory() -> dict:
+    """Current and lifetime-peak RSS of the server process, in MiB"""
+    return {"rss": _mb(current_rss()), "peak_rss": _mb(peak_rss())}
@@ -0,0 +1,378 @@
+import ast
+import asyncio
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from fastapi import HTTPException
+
+from ...core.config import settings
+from ...core.executors import WorkerPool, get_image_pool
+from .inference_backends import InferenceBackend
+from .preprocess import ModelUpload
+
+try:
+    import onnxruntime as ort
+except ImportError:  # optional: only the "onnx" backend needs it
+    ort = None
+
+# (gain, pad_x, pad_y) of a letterboxed input: input = original * gain + pad
+Letterbox = Tuple[float, float, float]
+
+LETTERBOX_FILL = 114
+
+
+def letterbox(image: np.ndarray, size: Tuple[int, int]) -> Tuple[np.ndarray, Letterbox]:
+    """
+    `image` (BGR) resized into `size` (h, w) keeping its aspect ratio and
+    padded around, as a CHW float32 RGB tensor in [0, 1], like the YOLO
+    exports expect.
+    """
+    h, w = image.shape[:2]
+    gain = min(size[0] / h, size[1] / w)
+    new_w, new_h = max(1, round(w * gain)), max(1, round(h * gain))
+    pad_x, pad_y = (size[1] - new_w) / 2, (size[0] - new_h) / 2
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    canvas = cv2.copyMakeBorder(
+        resized,
+        top,
+        size[0] - new_h - top,
+        left,
+        size[1] - new_w - left,
+        cv2.BORDER_CONSTANT,
+        value=(LETTERBOX_FILL,) * 3,
+    )
+    blob = cv2.dnn.blobFromImage(canvas, 1 / 255.0, swapRB=True)
+    return blob[0], (gain, float(left), float(top))
+
+
+def _polygon(mask: np.ndarray) -> Optional[np.ndarray]:
+    """Outline of the largest blob of a binary mask"""
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    contour = max(contours, key=cv2.contourArea)
+    return contour.reshape(-1, 2) if len(contour) >= 3 else None
+
+
+def decode_yolo(
+    outputs: List[np.ndarray],
+    box: Letterbox,
+    input_size: Tuple[int, int],
+    image_size: Tuple[int, int],
+    names: Dict[int, str],
+    confidence: float,
+    iou: float,
+) -> List[dict]:
+    """
+    Roboflow-style predictions from the raw outputs of one image of a
+    YOLOv8/11 detection or segmentation export: rows of `4 + classes +
+    mask coefficients` candidates, then NMS per class. Masks are built at
+    the prototype resolution, traced there and only the outline is scaled
+    to original-image pixels.
+    """
+    preds = outputs[0]
+    protos = outputs[1] if len(outputs) > 1 else None
+    n_masks = protos.shape[0] if protos is not None else 0
+    n_classes = preds.shape[0] - 4 - n_masks
+    preds = preds.T
+
+    class_scores = preds[:, 4 : 4 + n_classes]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(preds)), class_ids]
+    candidates = np.flatnonzero(scores >= confidence)
+    if not len(candidates):
+        return []
+    cx, cy, bw, bh = (preds[candidates, i] for i in range(4))
+    xywh = np.stack([cx - bw / 2, cy - bh / 2, bw, bh], axis=1)
+    keep = cv2.dnn.NMSBoxesBatched(
+        xywh, scores[candidates], class_ids[candidates], confidence, iou
+    )
+    keep = candidates[np.asarray(keep, dtype=np.intp).reshape(-1)]
+    if not len(keep):
+        return []
+
+    gain, pad_x, pad_y = box
+    img_w, img_h = image_size
+    # Candidate boxes as x0, y0, x1, y1 in input pixels
+    boxes = np.stack(
+        [
+            preds[keep, 0] - preds[keep, 2] / 2,
+            preds[keep, 1] - preds[keep, 3] / 2,
+            preds[keep, 0] + preds[keep, 2] / 2,
+            preds[keep, 1] + preds[keep, 3] / 2,
+        ],
+        axis=1,
+    )
+    orig = (boxes - [pad_x, pad_y, pad_x, pad_y]) / gain
+    orig = np.clip(orig, 0, [img_w, img_h, img_w, img_h])
+
+    masks = None
+    if protos is not None:
+        _, mh, mw = protos.shape
+        coeffs = preds[keep, 4 + n_classes :]
+        logits = (coeffs @ protos.reshape(n_masks, -1)).reshape(-1, mh, mw)
+        masks = logits > 0  # sigmoid(logit) > 0.5
+        scale_x, scale_y = mw / input_size[1], mh / input_size[0]
+
+    predictions = []
+    for k, idx in enumerate(keep):
+        x0, y0, x1, y1 = orig[k]
+        pred = {
+            "x": float((x0 + x1) / 2),
+            "y": float((y0 + y1) / 2),
+            "width": float(x1 - x0),
+            "height": float(y1 - y0),
+            "confidence": float(scores[idx]),
+            "class": names.get(int(class_ids[idx]), str(int(class_ids[idx]))),
+            "class_id": int(class_ids[idx]),
+            "detection_id": str(uuid.uuid4()),
+        }
+        if masks is not None:
+            # Keep the mask inside its box, as YOLO's own post-processing does
+            bx0, by0, bx1, by1 = boxes[k] * [scale_x, scale_y, scale_x, scale_y]
+            crop = np.zeros((mh, mw), dtype=np.uint8)
+            r0, r1 = max(0, int(by0)), min(mh, int(np.ceil(by1)))
+            c0, c1 = max(0, int(bx0)), min(mw, int(np.ceil(bx1)))
+            crop[r0:r1, c0:c1] = masks[k, r0:r1, c0:c1]
+            outline = _polygon(crop)
+            if outline is None:
+                continue
+            points = ((outline + 0.5) / [scale_x, scale_y] - [pad_x, pad_y]) / gain
+            points = np.clip(points, 0, [img_w, img_h])
+            pred["points"] = [{"x": float(x), "y": float(y)} for x, y in points]
+        predictions.append(pred)
+    return predictions
+
+
+def _metadata(session) -> dict:
+    """Model metadata written by Ultralytics exports (class names, imgsz)"""
+    meta = dict(session.get_modelmeta().custom_metadata_map)
+    parsed = {}
+    for key in ("names", "imgsz"):
+        if key in meta:
+            try:
+                parsed[key] = ast.literal_eval(meta[key])
+            except (ValueError, SyntaxError):
+                pass
+    return parsed
+
+
+@dataclass
+class OnnxModel:
+    """One loaded export and what is needed to feed and decode it"""
+
+    session: "ort.InferenceSession"
+    input_name: str
+    input_size: Tuple[int, int]  # (h, w)
+    max_batch: int
+    names: Dict[int, str]
+
+    @classmethod
+    def load(cls, path: Path, threads: int, max_batch: int) -> "OnnxModel":
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        session = ort.InferenceSession(
+            str(path), options, providers=["CPUExecutionProvider"]
+        )
+        meta = _metadata(session)
+        shape = session.get_inputs()[0].shape
+        imgsz = meta.get("imgsz")
+        if isinstance(imgsz, int):
+            imgsz = [imgsz, imgsz]
+        if not imgsz:
+            imgsz = [d if isinstance(d, int) else 640 for d in shape[2:4]]
+        # Static batch dimension (the export default): one image per run
+        if isinstance(shape[0], int):
+            max_batch = min(max_batch, shape[0])
+        names = meta.get("names") or {}
+        if isinstance(names, list):
+            names = dict(enumerate(names))
+        return cls(
+            session=session,
+            input_name=session.get_inputs()[0].name,
+            input_size=(int(imgsz[0]), int(imgsz[1])),
+            max_batch=max(1, max_batch),
+            names={int(k): str(v) for k, v in names.items()},
+        )
+
+    def run(self, batch: np.ndarray) -> List[List[np.ndarray]]:
+        """Outputs per image of a stacked NCHW batch"""
+        if self.max_batch == 1 and len(batch) > 1:
+            return [self.run(batch[i : i + 1])[0] for i in range(len(batch))]
+        outputs = self.session.run(None, {self.input_name: batch})
+        return [[out[i] for out in outputs] for i in range(len(batch))]
+
+
+class MicroBatcher:
+    """
+    Stacks the tensors submitted to one model within `wait_seconds` (or
+    until `max_batch` are waiting) into a single session run, so images
+    of concurrent requests share one forward pass.
+    """
+
+    def __init__(self, model: OnnxModel, runner: WorkerPool, wait_seconds: float):
+        self.model = model
+        self.runner = runner
+        self.wait_seconds = wait_seconds
+        self._pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._running: set = set()
+        self.runs = 0
+        self.images = 0
+
+    async def submit(self, tensor: np.ndarray) -> List[np.ndarray]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((tensor, future))
+        if len(self._pending) >= self.model.max_batch:
+            self._flush()
+        elif len(self._pending) == 1:
+            loop.call_later(self.wait_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        batch = [(t, f) for t, f in self._pending if not f.done()]
+        self._pending = []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        self.runs += 1
+        self.images += len(batch)
+        try:
+            tensors = np.stack([t for t, _ in batch])
+            results = await self.runner.run(self.model.run, tensors)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class OnnxBackend(InferenceBackend):
+    """
+    Runs exported models in-process on the CPU with ONNX Runtime. Each
+    model id maps to `<model_dir>/<model_id>.onnx` (e.g.
+    `models/wood_segment/17.onnx`), a YOLOv8/11 detection or segmentation
+    export; its session is created on first use and kept until the file
+    changes. Letterboxing and decoding run on the image pool, session runs
+    on their own threads and are micro-batched across concurrent requests.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str):
+        if ort is None:
+            raise RuntimeError("INFERENCE_BACKEND=onnx needs the `onnxruntime` package")
+        super().__init__()
+        self.model_dir = Path(model_dir)
+        self.confidence = settings.onnx_confidence
+        self.iou = settings.onnx_iou
+        self.runner = WorkerPool("onnx", "thread", settings.onnx_workers)
+        self._batchers: Dict[str, MicroBatcher] = {}
+        self._stamps: Dict[str, str] = {}  # model id -> stamp of the loaded file
+        self._load_lock = threading.Lock()
+
+    def _path(self, model_id: str) -> Path:
+        return self.model_dir / f"{model_id}.onnx"
+
+    def _stamp(self, model_id: str) -> Optional[str]:
+        """Identifies the export on disk: changes when the file is replaced"""
+        try:
+            stat = self._path(model_id).stat()
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    def variant(self, model_id: str, upload: ModelUpload) -> str:
+        # Cached responses are only reused for the same export and thresholds
+        return f"@onnx:{self._stamp(model_id)}" f":c{self.confidence:g}:i{self.iou:g}"
+
+    def _load(self, model_id: str, stamp: str) -> MicroBatcher:
+        with self._load_lock:
+            if self._stamps.get(model_id) != stamp:
+                path = self._path(model_id)
+                if not path.is_file():
+                    raise FileNotFoundError(f"No ONNX export at {path}")
+                model = OnnxModel.load(
+                    path, settings.onnx_threads, settings.onnx_max_batch
+                )
+                self._batchers[model_id] = MicroBatcher(
+                    model, self.runner, settings.onnx_batch_wait_ms / 1000
+                )
+                self._stamps[model_id] = stamp
+            return self._batchers[model_id]
+
+    async def _batcher(self, model_id: str) -> MicroBatcher:
+        stamp = self._stamp(model_id)
+        if stamp is None:
+            raise HTTPException(
+                status_code=503, detail=f"No ONNX export at {self._path(model_id)}"
+            )
+        if self._stamps.get(model_id) == stamp:
+            return self._batchers[model_id]
+        try:
+            return await asyncio.to_thread(self._load, model_id, stamp)
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    async def predict(
+        self, model_id: str, upload: ModelUpload, filename: Optional[str] = None
+    ) -> dict:
+        started = time.perf_counter()
+        batcher = await self._batcher(model_id)
+        model = batcher.model
+        image = await upload.image()
+        pool = get_image_pool()
+
+        tensor, box = await pool.run(letterbox, image, model.input_size)
+        outputs = await batcher.submit(tensor)
+        h, w = image.shape[:2]
+        predictions = await pool.run(
+            decode_yolo,
+            outputs,
+            box,
+            model.input_size,
+            (w, h),
+            model.names,
+            self.confidence,
+            self.iou,
+        )
+        return {
+            "inference_id": str(uuid.uuid4()),
+            "time": round(time.perf_counter() - started, 4),
+            "image": {"width": w, "height": h},
+            "predictions": predictions,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "runner": self.runner.stats(),
+            "models": {
+                model_id: {
+                    "input_size": list(b.model.input_size),
+                    "max_batch": b.model.max_batch,
+                    "runs": b.runs,
+                    "images": b.images,
+                    "mean_batch": round(b.images / b.runs, 2) if b.runs else 0.0,
+                }
+                for model_id, b in self._batchers.items()
+            },
+        }
+
+    async def aclose(self):
+        self.runner.shutdown()
+        await super().aclose()
@@ -0,0 +1,81 @@
+import asyncio
+import base64
+import json
+import secrets
+from typing import Dict, Iterator, Literal, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from .artifacts import ARTIFACT_TYPES, get_artifact_store
+
+# How image outputs are delivered:
+#   inline    - base64 strings inside the JSON body (original behaviour)
+#   multipart - multipart/mixed: a JSON part, then one binary part per image
+#   url       - images stored as artifacts, JSON carries `<name>_url` links
+OutputMode = Literal["inline", "multipart", "url"]
+
+# name -> (encoded bytes, format key of ARTIFACT_TYPES)
+Images = Dict[str, Tuple[bytes, str]]
+
+
+def _multipart_parts(boundary: str, payload: dict, images: Images) -> Iterator[bytes]:
+    yield (
+        f"--{boundary}\r\n"
+        "Content-Type: application/json\r\n"
+        'Content-Disposition: inline; name="result"\r\n\r\n'
+    ).encode()
+    yield json.dumps(jsonable_encoder(payload)).encode()
+    for name in list(images):
+        # Pop as we go so each image can be freed once it has been sent
+        data, fmt = images.pop(name)
+        yield (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {ARTIFACT_TYPES[fmt]}\r\n"
+            f'Content-Disposition: attachment; name="{name}"; filename="{name}.{fmt}"\r\n'
+            f"Content-Length: {len(data)}\r\n\r\n"
+        ).encode()
+        yield data
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+def artifact_url_prefix(request: Request) -> str:
+    """Absolute URL that an artifact id is appended to, fixed per deployment"""
+    return str(request.url_for("get_artifact", artifact_id="_"))[:-1]
+
+
+async def store_images(
+    payload: dict,
+    images: Images,
+    url_prefix: str,
+    ttl_seconds: Optional[float] = None,
+) -> dict:
+    """
+    Write `images` to the artifact store and link them as `<name>_url`;
+    `ttl_seconds` overrides the store's lifetime
+    """
+    store = get_artifact_store()
+    for name, (data, fmt) in images.items():
+        artifact_id = await asyncio.to_thread(store.put, data, fmt, ttl_seconds)
+        payload[f"{name}_url"] = url_prefix + artifact_id
+    return payload
+
+
+async def build_image_response(
+    request: Request, mode: str, payload: dict, images: Images
+):
+    """Attach `images` to `payload` according to the output `mode`"""
+    if mode == "multipart":
+        boundary = secrets.token_hex(16)
+        return StreamingResponse(
+            _multipart_parts(boundary, payload, images),
+            media_type=f"multipart/mixed; boundary={boundary}",
+        )
+
+    if mode == "url":
+        return await store_images(payload, images, artifact_url_prefix(request))
+
+    for name, (data, _) in images.items():
+        payload[name] = base64.b64encode(data).decode("utf-8")
+    return payload
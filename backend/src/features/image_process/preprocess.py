@@ -0,0 +1,118 @@
+import asyncio
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from fastapi import HTTPException
+
+from ...core.config import settings
+from ...core.executors import WorkerPool
+from .render import encode_image
+from .timing import StageTimer
+
+# (x, y) factors from the uploaded image's pixels back to the original's
+Scale = Tuple[float, float]
+
+
+def downscale_for_upload(
+    image: np.ndarray, max_side: int, quality: int
+) -> Tuple[Optional[bytes], Scale]:
+    """
+    JPEG of `image` shrunk so its longest side is `max_side`, and the
+    factors that map coordinates on it back to `image`. Returns
+    `(None, (1, 1))` when the image is already small enough, in which
+    case the original upload is sent untouched.
+    """
+    h, w = image.shape[:2]
+    if not max_side or max(h, w) <= max_side:
+        return None, (1.0, 1.0)
+    ratio = max_side / max(h, w)
+    size = (max(1, round(w * ratio)), max(1, round(h * ratio)))
+    small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return encode_image(small, "jpeg", quality), (w / size[0], h / size[1])
+
+
+def _scale_prediction(pred: dict, fx: float, fy: float) -> dict:
+    scaled = dict(pred)
+    for key, factor in (("x", fx), ("y", fy), ("width", fx), ("height", fy)):
+        if key in scaled:
+            scaled[key] = scaled[key] * factor
+    if "points" in scaled:
+        scaled["points"] = [
+            {**p, "x": p["x"] * fx, "y": p["y"] * fy} for p in scaled["points"]
+        ]
+    return scaled
+
+
+def rescale_predictions(
+    result: dict, scale: Scale, original_size: Tuple[int, int]
+) -> dict:
+    """Copy of a Roboflow response with boxes/points in original-image pixels"""
+    fx, fy = scale
+    if fx == 1.0 and fy == 1.0:
+        return result
+    rescaled = dict(result)
+    rescaled["predictions"] = [
+        _scale_prediction(pred, fx, fy) for pred in result.get("predictions", [])
+    ]
+    if "image" in result:
+        rescaled["image"] = {
+            **result["image"],
+            "width": original_size[0],
+            "height": original_size[1],
+        }
+    return rescaled
+
+
+class ModelUpload:
+    """
+    What the model calls of one request upload: the decoded image, shrunk
+    to the models' working resolution and re-encoded once, then shared by
+    every call. Built lazily so requests answered entirely from the
+    inference cache never pay for it.
+    """
+
+    def __init__(
+        self,
+        original_bytes: bytes,
+        image: "asyncio.Future[Optional[np.ndarray]]",
+        pool: WorkerPool,
+        timer: StageTimer,
+    ):
+        self.original_bytes = original_bytes
+        self.max_side = settings.roboflow_upload_max_side
+        self.quality = settings.roboflow_upload_quality
+        self._image = image
+        self._pool = pool
+        self._timer = timer
+        self._prepared: Optional[asyncio.Task] = None
+
+    @property
+    def variant(self) -> str:
+        """Distinguishes cached responses made at different upload sizes"""
+        return f"@{self.max_side}" if self.max_side else ""
+
+    async def image(self) -> np.ndarray:
+        """The decoded original, for backends that run the models in-process"""
+        image = await asyncio.shield(self._image)
+        if image is None:
+            raise HTTPException(status_code=400, detail="Invalid image file")
+        return image
+
+    async def _prepare(self) -> Tuple[bytes, Scale, Optional[Tuple[int, int]]]:
+        if not self.max_side:
+            # Nothing to shrink: don't hold the upload back for the decode
+            return self.original_bytes, (1.0, 1.0), None
+        image = await self.image()
+        data, scale = await self._timer.track(
+            "prepare_upload",
+            self._pool.run(downscale_for_upload, image, self.max_side, self.quality),
+        )
+        h, w = image.shape[:2]
+        return data or self.original_bytes, scale, (w, h)
+
+    async def get(self) -> Tuple[bytes, Scale, Optional[Tuple[int, int]]]:
+        """`(bytes to upload, scale back to the original, original (w, h))`"""
+        if self._prepared is None:
+            self._prepared = asyncio.ensure_future(self._prepare())
+        return await asyncio.shield(self._prepared)
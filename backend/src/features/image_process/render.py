@@ -0,0 +1,83 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+# Output formats accepted by the image endpoints, with their MIME types
+IMAGE_FORMATS = {"png": "image/png", "jpeg": "image/jpeg"}
+
+# Longest side of each panel in the composed figure; the Matplotlib figure
+# rendered at roughly this size too (16x8 inches at 100 dpi)
+PANEL_MAX_SIDE = 800
+
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+_WHITE = (255, 255, 255)
+_BLACK = (0, 0, 0)
+
+
+def encode_image(image_bgr: np.ndarray, fmt: str = "png", quality: int = 90) -> bytes:
+    """
+    Encode a BGR image with OpenCV. `quality` is the JPEG quality (1-100);
+    PNG is lossless and ignores it.
+    """
+    if fmt == "jpeg":
+        ok, buf = cv2.imencode(".jpg", image_bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    elif fmt == "png":
+        ok, buf = cv2.imencode(".png", image_bgr, [cv2.IMWRITE_PNG_COMPRESSION, 3])
+    else:
+        raise ValueError(f"Unknown image format '{fmt}'")
+    if not ok:
+        raise ValueError(f"Could not encode image as {fmt}")
+    return buf.tobytes()
+
+
+def fit_panel(image_bgr: np.ndarray, max_side: int) -> np.ndarray:
+    """`image_bgr` downscaled so its longest side is at most `max_side`"""
+    h, w = image_bgr.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return image_bgr
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(image_bgr, size, interpolation=cv2.INTER_AREA)
+
+
+def compose_panels(
+    panels: List[Tuple[np.ndarray, str]], max_side: int = PANEL_MAX_SIDE
+) -> np.ndarray:
+    """
+    Lay titled BGR images side by side on a white canvas, the way
+    `plt.subplots(1, n)` with `axis('off')` and a title per axis does.
+    Panels are downscaled so their longest side is at most `max_side`.
+    """
+    fitted = [fit_panel(image, max_side) for image, _ in panels]
+    panel_h = max(image.shape[0] for image in fitted)
+    panel_w = max(image.shape[1] for image in fitted)
+
+    font_scale = max(0.4, panel_w / 1000)
+    thickness = max(1, round(font_scale * 1.5))
+    (_, text_h), baseline = cv2.getTextSize("Ag", _FONT, font_scale, thickness)
+    title_h = text_h + baseline + 2 * round(text_h * 0.6)
+    margin = max(8, panel_w // 40)
+
+    canvas_h = margin + title_h + panel_h + margin
+    canvas_w = margin + len(fitted) * (panel_w + margin)
+    canvas = np.full((canvas_h, canvas_w, 3), _WHITE, dtype=np.uint8)
+
+    for i, (image, (_, title)) in enumerate(zip(fitted, panels)):
+        x0 = margin + i * (panel_w + margin)
+        h, w = image.shape[:2]
+        # Centre the image in its cell, like imshow with equal aspect
+        top = margin + title_h + (panel_h - h) // 2
+        left = x0 + (panel_w - w) // 2
+        canvas[top : top + h, left : left + w] = image
+
+        (text_w, _), _ = cv2.getTextSize(title, _FONT, font_scale, thickness)
+        origin = (
+            x0 + max(0, (panel_w - text_w) // 2),
+            margin + title_h - baseline - round(text_h * 0.3),
+        )
+        cv2.putText(
+            canvas, title, origin, _FONT, font_scale, _BLACK, thickness, cv2.LINE_AA
+        )
+
+    return canvas
@@ -0,0 +1,337 @@
+import io
+
+import cv2
+import numpy as np
+import seaborn as sns
+from matplotlib.figure import Figure
+from scipy.signal import find_peaks
+
+from .timing import StageTimer
+
+# Applied once: seaborn themes change process-global matplotlib state
+sns.set_theme(style="whitegrid")
+
+# Longest side of an image handed to Matplotlib, about twice the figures'
+# pixel size so downscaling stays invisible
+FIGURE_MAX_SIDE = 1600
+
+
+def cartesian_to_polar(img, center):
+    h, w = img.shape[:2]
+    max_radius = int(np.linalg.norm([max(center[0], w - center[0]), max(center[1], h - center[1])]))
+    # Without WARP_FILL_OUTLIERS, pixels beyond the image are left uninitialised
+    polar_img = cv2.warpPolar(
+        img, (360, max_radius), center, max_radius,
+        flags=cv2.WARP_POLAR_LINEAR | cv2.WARP_FILL_OUTLIERS,
+    )
+    _, polar_img = cv2.threshold(polar_img, 15, 255, cv2.THRESH_TOZERO)
+    return polar_img
+
+
+def fig_to_png(fig) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches='tight')
+    return buf.getvalue()
+
+
+def _enhance_lut() -> np.ndarray:
+    """
+    The pointwise part of the chain as one table: invert, gamma 2.5,
+    invert back, then the two contrast stretches. Every step maps uint8 to
+    uint8 per pixel, so chaining them over all 256 levels gives exactly the
+    same result as applying them one by one.
+    """
+    levels = np.arange(256, dtype=np.uint8).reshape(1, -1)
+    inv_gamma = 1.0 / 2.5
+    gamma_lut = np.array([((i / 255.0) ** inv_gamma) * 255 for i in range(256)]).astype("uint8")
+    boosted = 255 - cv2.LUT(255 - levels, gamma_lut)
+    contrast_enhanced = cv2.convertScaleAbs(boosted, alpha=1.2, beta=-20)
+    white_boosted = cv2.convertScaleAbs(contrast_enhanced, alpha=1.3, beta=20)
+    return white_boosted.reshape(256)
+
+
+ENHANCE_LUT = _enhance_lut()
+
+# Rows of context a band needs for exact results: 3 for the 7x7 blur,
+# 1 for the 3x3 one
+BAND_HALO = 4
+
+
+def _sharpen(src, dst, scratch):
+    """Unsharp mask and a light blur: the neighbourhood part of the chain"""
+    cv2.GaussianBlur(src, (7, 7), 10, dst=scratch)
+    cv2.addWeighted(src, 1.5, scratch, -0.5, 0, dst=scratch)
+    cv2.GaussianBlur(scratch, (3, 3), 1, dst=dst)
+
+
+def enhance_rings(img, band_rows: int = 0, overwrite: bool = False):
+    """
+    Contrast/sharpening chain followed by Canny edges.
+
+    With `band_rows`, the chain runs on horizontal bands of that many rows
+    plus a `BAND_HALO`-row margin through a few reused band buffers instead
+    of full-size intermediates, and with `overwrite` its output replaces
+    `img`; the result is identical to whole-image processing. Canny runs
+    once over the whole image, because hysteresis links weak edges across
+    any distance, into its own buffer (in place it copies its input).
+    """
+    h, w = img.shape[:2]
+    sharpened = img if overwrite else np.empty_like(img)
+    if not band_rows or band_rows >= h:
+        boosted = cv2.LUT(img, ENHANCE_LUT)
+        _sharpen(boosted, sharpened, np.empty_like(boosted))
+        del boosted
+    else:
+        _sharpen_bands(img, sharpened, max(band_rows, BAND_HALO))
+
+    edges = np.empty_like(sharpened)
+    return cv2.Canny(sharpened, 50, 150, edges=edges)
+
+
+def _sharpen_bands(img, out, band_rows: int):
+    """LUT and `_sharpen` of `img` into `out` (may be `img`), band by band"""
+    h, w = img.shape[:2]
+    in_place = np.shares_memory(img, out)
+    size = band_rows + 2 * BAND_HALO
+    boosted = np.empty((size, w), np.uint8)
+    scratch = np.empty_like(boosted)
+    sharpened = np.empty_like(boosted)
+    # When writing in place, the rows above a band are already sharpened:
+    # keep the original last rows of each band for the next one
+    carry = np.empty((BAND_HALO, w), np.uint8)
+
+    for top in range(0, h, band_rows):
+        bottom = min(h, top + band_rows)
+        above = min(top, BAND_HALO)
+        below = min(h, bottom + BAND_HALO) - bottom
+        n = above + (bottom - top) + below
+        if above:
+            context = carry[BAND_HALO - above :] if in_place else img[top - above : top]
+            cv2.LUT(context, ENHANCE_LUT, dst=boosted[:above])
+        cv2.LUT(img[top : bottom + below], ENHANCE_LUT, dst=boosted[above:n])
+        _sharpen(boosted[:n], sharpened[:n], scratch[:n])
+        if in_place and bottom < h:
+            carry[:] = img[bottom - BAND_HALO : bottom]
+        out[top:bottom] = sharpened[above : above + bottom - top]
+
+
+def count_rings(polar_edges, rays: int = 360, min_distance: int = 5):
+    """
+    Ring edges crossed by each ray of the polar edge image, all rays at once.
+
+    Rows of `polar_edges` are angles and columns radii. Each sampled row is
+    binarised and its runs of edge pixels found from a single pass over the
+    transitions of the whole 2D array (a run touching either border is not
+    a crossing, matching `find_peaks` on a single line). A run closer than
+    `min_distance` columns to the last kept one on the same ray is dropped,
+    which gives the count of `find_peaks(..., distance=min_distance)`.
+    `rays=0` uses every row.
+
+    Returns the sampled row indices, the count per ray and the `(ray, column)`
+    position of every crossing.
+    """
+    height, width = polar_edges.shape
+    if rays and rays < height:
+        line_indices = np.linspace(0, height - 1, rays, dtype=int)
+    else:
+        line_indices = np.arange(height)
+
+    # Pad with edge pixels so border-touching runs never open and close
+    binary = np.ones((len(line_indices), width + 2), np.bool_)
+    np.greater(polar_edges[line_indices], 0, out=binary[:, 1:-1])
+    steps = binary[:, 1:] != binary[:, :-1]
+    stride = np.int32(steps.shape[1])
+    # One pass over all rays: every ray starts and ends on an edge pixel, so
+    # its transitions alternate fall, rise, ..., fall and, flattened, the odd
+    # ones are rises. Rise 2k + 1 is closed by fall 2k + 2 when that fall is
+    # on the same ray (a ray's last rise runs into the padding)
+    flat = np.flatnonzero(steps).astype(np.int32)
+    rises, falls = flat[1:-1:2], flat[2::2]
+    row_start = rises - rises % stride
+    valid = falls < row_start + stride
+    run_rows = np.compress(valid, row_start) // stride
+    # Step i is from padded column i to i + 1, i.e. a run starting at
+    # original column i after a rise, ending at i - 1 before a fall
+    centers = (np.compress(valid, rises + falls) - 1) // 2 - np.compress(
+        valid, row_start
+    )
+
+    if min_distance > 1 and len(centers) > 1:
+        run_rows, centers = _merge_close_runs(run_rows, centers, min_distance)
+
+    line_counts = np.bincount(run_rows, minlength=len(line_indices))
+    return line_indices, line_counts.tolist(), (run_rows, centers)
+
+
+def _merge_close_runs(run_rows, centers, min_distance: int):
+    """
+    Drop runs closer than `min_distance` to the last kept run of their ray.
+
+    A run at least `min_distance` past the previous one (or first on its
+    ray) is always kept, so only runs in chains of close neighbours need
+    the sequential walk.
+    """
+    close = np.zeros(len(centers), np.bool_)
+    np.logical_and(
+        run_rows[1:] == run_rows[:-1],
+        centers[1:] - centers[:-1] < min_distance,
+        out=close[1:],
+    )
+    keep = ~close
+    chained = np.flatnonzero(close)
+    if len(chained):
+        columns = centers.tolist()
+        opens = keep[chained - 1].tolist()
+        kept = []
+        last = 0
+        for i, opened in zip(chained.tolist(), opens):
+            if opened:  # the previous run starts the chain and is kept
+                last = columns[i - 1]
+            if columns[i] - last >= min_distance:
+                kept.append(i)
+                last = columns[i]
+        keep[kept] = True
+    return run_rows[keep], centers[keep]
+
+
+def ring_boundaries(crossings, rays: int, width: int, radius_per_column: float,
+                    min_support: float = 0.3, min_distance: int = 5):
+    """
+    Radii (pixels) at which a ring edge is seen by at least `min_support`
+    of the rays: peaks of the radial histogram of all crossings.
+    """
+    _, columns = crossings
+    support = np.bincount(columns, minlength=width)
+    # Rings are not perfect circles around the detected pith: pool each
+    # column with its neighbours. Crossings on one ray are at least
+    # `min_distance` apart, so a ray still counts at most once per window
+    support = np.convolve(support, np.ones(3, dtype=int), mode="same")
+    peaks, _ = find_peaks(support, height=min_support * rays, distance=min_distance)
+    return [round(float(c * radius_per_column), 1) for c in peaks]
+
+
+def consensus_count(line_counts) -> int:
+    """Median count over all rays; insensitive to rays crossing cracks or knots"""
+    return int(np.rint(np.median(line_counts))) if len(line_counts) else 0
+
+
+def _for_display(img, max_side: int = FIGURE_MAX_SIDE):
+    """
+    Downscaled copy for `imshow`: Matplotlib resamples through float
+    buffers, several times the size of a full-resolution scan
+    """
+    h, w = img.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return img
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def render_ring_figures(edges, polar_edges, line_indices, line_counts) -> dict:
+    # Matplotlib's object API: pyplot's global state is not thread-safe
+    fig1 = Figure(figsize=(8, 6))
+    ax = fig1.subplots()
+    ax.imshow(_for_display(edges), cmap="gray")
+    ax.set_title("Canny Edge Detection")
+    ax.axis("off")
+    img_canny = fig_to_png(fig1)
+
+    fig2 = Figure(figsize=(6, 8))
+    ax = fig2.subplots()
+    ax.imshow(polar_edges, cmap='gray', aspect='auto')
+    # Draw at most 20 of the rays so the image stays visible
+    for y in line_indices[:: max(1, len(line_indices) // 20)]:
+        ax.axhline(y=y, color='cyan', linestyle='--', linewidth=1)
+    ax.set_title("Polar Transform with Scan Lines")
+    ax.set_xlabel("Angle (degrees)")
+    ax.set_ylabel("Radius (pixels)")
+    img_polar = fig_to_png(fig2)
+
+    fig3 = Figure(figsize=(6, 8))
+    ax = fig3.subplots()
+    sns.boxplot(data=line_counts, orient='v', width=0.3, color="#4c72b0", fliersize=6, linewidth=2, ax=ax)
+    ax.set_title("Distribution of Ring Counts", fontsize=14, weight='bold')
+    ax.set_ylabel("Ring Count", fontsize=12)
+    ax.set_xticks([])
+    img_box = fig_to_png(fig3)
+
+    return {
+        "img_canny": (img_canny, "png"),
+        "img_polar": (img_polar, "png"),
+        "img_boxplot": (img_box, "png"),
+    }
+
+
+def boxplot_summary(line_counts) -> dict:
+    q1 = np.percentile(line_counts, 25)
+    median = np.percentile(line_counts, 50)
+    q3 = np.percentile(line_counts, 75)
+    iqr = q3 - q1
+    # Outliers: values < Q1 - 1.5*IQR or > Q3 + 1.5*IQR
+    lower_bound = q1 - 1.5 * iqr
+    upper_bound = q3 + 1.5 * iqr
+    outliers = [x for x in line_counts if x < lower_bound or x > upper_bound]
+    q1_range = (int(np.floor(q1)), int(np.ceil(q3)))
+
+    return {
+        "Q1": float(q1),
+        "Median": float(median),
+        "Q3": float(q3),
+        "IQR": float(iqr),
+        "Outliers": outliers,
+        "Q1_Q3_range": q1_range
+    }
+
+
+def process_ring_count(
+    img,
+    center,
+    visualize: bool = True,
+    rays: int = 360,
+    band_rows: int = 0,
+    overwrite: bool = False,
+) -> dict:
+    """
+    Everything after pith detection for /ring-count; `img` may be BGR or
+    grayscale. Pure and module-level so it can run on a thread or process pool.
+    The three figures are returned as PNG bytes under `images`; with
+    `visualize=False` they are not drawn at all. `band_rows` bounds the
+    enhancement's working memory and with `overwrite` a grayscale `img` is
+    used as its buffer (see `enhance_rings`).
+    """
+    timer = StageTimer()
+
+    with timer.stage("enhance"):
+        if img.ndim == 3:
+            img, overwrite = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), True
+        edges = enhance_rings(img, band_rows, overwrite)
+        del img
+
+    with timer.stage("polar"):
+        polar_edges = cartesian_to_polar(edges, center=center)
+
+    with timer.stage("count"):
+        line_indices, line_counts, crossings = count_rings(polar_edges, rays)
+        # warpPolar spreads `max_radius` (= the row count) over the columns
+        radius_per_column = polar_edges.shape[0] / polar_edges.shape[1]
+        radii = ring_boundaries(
+            crossings, len(line_indices), polar_edges.shape[1], radius_per_column
+        )
+
+    images = {}
+    if visualize:
+        with timer.stage("render"):
+            images = render_ring_figures(edges, polar_edges, line_indices, line_counts)
+
+    return {
+        "pith_center": center,
+        "rays": len(line_indices),
+        "ring_counts": line_counts,
+        "mean_ring_count": float(np.mean(line_counts)),
+        "consensus_ring_count": consensus_count(line_counts),
+        "ring_radii_px": radii,
+        "images": images,
+        "boxplot_summary": boxplot_summary(line_counts),
+        "timings_ms": timer.timings,
+    }
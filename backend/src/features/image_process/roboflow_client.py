@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import random
+from typing import Optional
+
+import httpx
+
+from ...core.config import settings
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# A request that already waited out the timeout is not tried again: each
+# retry would hold the caller for another `roboflow_timeout_seconds`
+NO_RETRY_ERRORS = (httpx.ReadTimeout, httpx.WriteTimeout)
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class RoboflowClient:
+    """
+    Application-scoped HTTP client for Roboflow inference. One pooled
+    connection set is reused by every request, and 429/5xx responses or
+    transport errors other than read/write timeouts are retried with
+    exponential backoff. Waits are capped
+    at `roboflow_max_backoff_seconds`; a `Retry-After` longer than the
+    request timeout is not waited for at all.
+    """
+
+    def __init__(self):
+        http2 = settings.roboflow_http2 and _http2_available()
+        if settings.roboflow_http2 and not http2:
+            logger.warning(
+                "HTTP/2 requested for Roboflow but `h2` is not installed; using HTTP/1.1"
+            )
+
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.roboflow_max_connections,
+                max_keepalive_connections=settings.roboflow_max_keepalive,
+                keepalive_expiry=settings.roboflow_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.roboflow_timeout_seconds,
+                connect=settings.roboflow_connect_timeout_seconds,
+            ),
+        )
+        self.max_retries = settings.roboflow_max_retries
+        self.backoff_seconds = settings.roboflow_backoff_seconds
+        self.max_backoff_seconds = settings.roboflow_max_backoff_seconds
+        self.timeout_seconds = settings.roboflow_timeout_seconds
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """POST with retries; the last response (or error) is returned as-is"""
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await self.client.post(url, **kwargs)
+            except httpx.TransportError as e:
+                if last_attempt or isinstance(e, NO_RETRY_ERRORS):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                return response
+            delay = self._backoff(attempt, response)
+            if delay is None:
+                return response
+            await asyncio.sleep(delay)
+
+    def _backoff(
+        self, attempt: int, response: httpx.Response | None = None
+    ) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up now"""
+        retry_after = response.headers.get("Retry-After") if response else None
+        if retry_after and retry_after.isdigit():
+            # Waiting longer than a whole request may take would only hold
+            # the caller's slot; the response is returned instead
+            if float(retry_after) > self.timeout_seconds:
+                return None
+            return min(float(retry_after), self.max_backoff_seconds)
+        delay = self.backoff_seconds * (2**attempt)
+        return min(delay + random.uniform(0, delay / 2), self.max_backoff_seconds)
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,36 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """Wall-clock duration of each pipeline stage, in milliseconds"""
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def track(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable`, recording how long it took under `name`"""
+        with self.stage(name):
+            return await awaitable
+
+    def as_dict(self) -> Dict[str, float]:
+        total = round((time.perf_counter() - self._started) * 1000, 1)
+        return {**self.timings, "total": total}
+
+    def log(self, endpoint: str):
+        logger.info("%s timings (ms): %s", endpoint, self.as_dict())
@@ -0,0 +1,248 @@
+import asyncio
+import io
+import struct
+from typing import IO, Callable, Optional, Tuple
+
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.routing import APIRoute
+
+from ...core.config import settings
+
+# Formats accepted by the image endpoints (what OpenCV decodes and the
+# batch endpoints take from archives), told apart by their magic bytes
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+)
+
+# JPEG start-of-frame markers: C0-CF except DHT (C4), JPG (C8), DAC (CC)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_MB = 1024 * 1024
+
+# Room for the multipart framing and small form fields around one image
+FORM_OVERHEAD_BYTES = _MB
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Image format from the first bytes of a file, or None"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for signature, fmt in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return fmt
+    return None
+
+
+def _jpeg_size(f: IO[bytes]) -> Optional[Tuple[int, int]]:
+    # Walk the marker segments up to the frame header; EXIF/ICC segments
+    # before it are skipped by their length, not read
+    f.seek(2)
+    while True:
+        if f.read(1) != b"\xff":
+            return None
+        marker = f.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = f.read(1)
+        if not marker or marker[0] in (0xD9, 0xDA):  # end of image, scan data
+            return None
+        if marker[0] == 0x01 or 0xD0 <= marker[0] <= 0xD7:  # no length
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if marker[0] in _SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(struct.unpack(">H", length)[0] - 2, io.SEEK_CUR)
+
+
+def _tiff_size(f: IO[bytes]) -> Optional[Tuple[int, int]]:
+    f.seek(0)
+    head = f.read(8)
+    endian = "<" if head[:2] == b"II" else ">"
+    (offset,) = struct.unpack(endian + "I", head[4:8])
+    f.seek(offset)
+    count_bytes = f.read(2)
+    if len(count_bytes) < 2:
+        return None
+    (count,) = struct.unpack(endian + "H", count_bytes)
+    entries = f.read(12 * count)
+    size = {}
+    for i in range(len(entries) // 12):
+        tag, kind = struct.unpack(endian + "HH", entries[i * 12 : i * 12 + 4])
+        if tag in (256, 257) and kind in (3, 4):
+            fmt = endian + ("H" if kind == 3 else "I")
+            size[tag] = struct.unpack_from(fmt, entries, i * 12 + 8)[0]
+    if 256 in size and 257 in size:
+        return size[256], size[257]
+    return None
+
+
+def _webp_size(head: bytes) -> Optional[Tuple[int, int]]:
+    chunk = head[12:16]
+    if chunk == b"VP8X" and len(head) >= 30:
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+    if chunk == b"VP8 " and len(head) >= 30 and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(head) >= 25 and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    return None
+
+
+def image_size(f: IO[bytes], fmt: str) -> Optional[Tuple[int, int]]:
+    """`(width, height)` from the header of a seekable image file"""
+    try:
+        if fmt == "jpeg":
+            return _jpeg_size(f)
+        if fmt == "tiff":
+            return _tiff_size(f)
+        f.seek(0)
+        head = f.read(32)
+        if fmt == "png" and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if fmt == "bmp":
+            (header_size,) = struct.unpack("<I", head[14:18])
+            if header_size == 12:
+                return struct.unpack("<HH", head[18:22])
+            width, height = struct.unpack("<ii", head[18:26])
+            return abs(width), abs(height)
+        if fmt == "webp":
+            return _webp_size(head)
+    except (struct.error, ValueError, OSError):
+        return None
+    return None
+
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """`(width, height)` of an encoded image in memory, from its header"""
+    fmt = sniff_format(data[:16])
+    return image_size(io.BytesIO(data), fmt) if fmt else None
+
+
+def check_image(f: IO[bytes], size: int, max_bytes: int, max_pixels: int) -> str:
+    """
+    Validate an image file from its length and header alone: 413 past
+    `max_bytes` or `max_pixels`, 415 for anything but JPEG, PNG, BMP,
+    TIFF or WebP, 400 for a header that does not parse. Returns the format.
+    """
+    if size > max_bytes:
+        raise HTTPException(
+            status_code=413, detail=f"Image larger than {max_bytes / _MB:g} MiB"
+        )
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty upload")
+    f.seek(0)
+    fmt = sniff_format(f.read(16))
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Unsupported image format (JPEG, PNG, BMP, TIFF or WebP)",
+        )
+    dimensions = image_size(f, fmt)
+    if dimensions is None or 0 in dimensions:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+    width, height = dimensions
+    if width * height > max_pixels:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image of {width}x{height} pixels exceeds "
+            f"{max_pixels / 1e6:g} megapixels",
+        )
+    return fmt
+
+
+def check_image_bytes(
+    data: bytes, max_bytes: Optional[int] = None, max_pixels: Optional[int] = None
+) -> str:
+    """`check_image` for an image already in memory (batch items, jobs)"""
+    return check_image(
+        io.BytesIO(data),
+        len(data),
+        max_bytes or settings.image_max_bytes,
+        max_pixels or settings.image_max_pixels,
+    )
+
+
+def _read_checked(f: IO[bytes], max_bytes: int, max_pixels: int) -> bytes:
+    size = f.seek(0, io.SEEK_END)
+    check_image(f, size, max_bytes, max_pixels)
+    f.seek(0)
+    # One read into the bytes every later stage shares; decoding wraps them
+    # with np.frombuffer, without another copy
+    return f.read()
+
+
+async def read_image_upload(
+    upload: UploadFile,
+    max_bytes: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+) -> bytes:
+    """
+    The bytes of an uploaded image, read only after its size, format and
+    pixel dimensions passed `check_image`. The spooled file may be on disk,
+    so this runs off the event loop.
+    """
+    return await asyncio.to_thread(
+        _read_checked,
+        upload.file,
+        max_bytes or settings.image_max_bytes,
+        max_pixels or settings.image_max_pixels,
+    )
+
+
+def limited_body_route(max_bytes: Callable[[], int]) -> type:
+    """
+    Route class whose request bodies may not exceed `max_bytes()`: checked
+    against Content-Length before anything is read, and counted while the
+    form parser streams the body, so an oversized upload is cut off with
+    413 instead of being spooled to disk first.
+    """
+
+    class LimitedBodyRoute(APIRoute):
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+
+            async def limited_handler(request: Request):
+                limit = max_bytes()
+                too_large = HTTPException(
+                    status_code=413,
+                    detail=f"Request body larger than {limit / _MB:g} MiB",
+                )
+                length = request.headers.get("content-length", "")
+                if length.isdigit() and int(length) > limit:
+                    raise too_large
+
+                received = 0
+                receive = request.receive
+
+                async def counting_receive():
+                    nonlocal received
+                    message = await receive()
+                    received += len(message.get("body", b""))
+                    if received > limit:
+                        raise too_large
+                    return message
+
+                return await handler(Request(request.scope, counting_receive))
+
+            return limited_handler
+
+    return LimitedBodyRoute
+
+
+# Single-image endpoints: one image plus form framing
+ImageUploadRoute = limited_body_route(
+    lambda: settings.image_max_bytes + FORM_OVERHEAD_BYTES
+)
+# Batch endpoints: the whole multipart body
+BatchUploadRoute = limited_body_route(lambda: settings.batch_max_request_bytes)
@@ -15,23 +15,23 @@ DBSession = Annotated[Session, Depends(get_session)]
 
 
 @router.post("/register", response_model=Message)
-def create_user(info: schema.UserCreate, session: DBSession):
+async def create_user(info: schema.UserCreate, session: DBSession):
     """
     Register a new user with hashed password.
     """
-    return service.create_user(info, session)
+    return await service.create_user(info, session)
 
 
 @router.post("/login", response_model=Token)
-def login(session: DBSession, form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(session: DBSession, form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Authenticate user and return JWT access token.
     """
-    return service.authenticate_user(form_data, session)
+    return await service.authenticate_user(form_data, session)
 
 
 @router.get("/me")
-def read_current_user(current_user: TokenData = Depends(oauth2.get_current_user)):
+async def read_current_user(current_user: TokenData = Depends(oauth2.get_current_user)):
     """
     Return the authenticated user's information from the `Access Token`.
     """
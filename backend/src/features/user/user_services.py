@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
@@ -8,13 +10,22 @@ from src.schemas import Token
 from . import user_schemas as schema
 
 
-def create_user(info: schema.UserCreate, session: Session):
+def _find_user(session: Session, email: str):
+    statement = select(models.User).where(models.User.email == email)
+    return session.exec(statement).first()
+
+
+def _save(session: Session, user: models.User):
+    session.add(user)
+    session.commit()
+
+
+async def create_user(info: schema.UserCreate, session: Session):
     """
     Register a new user with unique email and hashed password.
     """
 
-    statement = select(models.User).where(models.User.email == info.email)
-    existing_user = session.exec(statement).first()
+    existing_user = await asyncio.to_thread(_find_user, session, info.email)
 
     if existing_user:
         raise HTTPException(
@@ -22,33 +33,43 @@ def create_user(info: schema.UserCreate, session: Session):
             detail="User with this email already exists",
         )
 
-    # Hash password
-    info.password = hashing.hash(info.password)
+    # Hash password on the hashing pool
+    info.password = await hashing.hash_async(info.password)
 
     # Create user model
     new_user = models.User(**info.model_dump())
-    session.add(new_user)
-    session.commit()
-    new_user = session.refresh(new_user)
+    await asyncio.to_thread(_save, session, new_user)
 
     return {"message": "User created Successfully"}
 
 
-def authenticate_user(form_data: OAuth2PasswordRequestForm, session: Session) -> Token:
+async def authenticate_user(
+    form_data: OAuth2PasswordRequestForm, session: Session
+) -> Token:
     """
-    Verify user credentials and return a JWT access token.
+    Verify user credentials and return a JWT access token. A password
+    hash made with another cost than the configured one is replaced.
     """
 
-    statement = select(models.User).where(models.User.email == form_data.username)
-    user = session.exec(statement).first()
+    user = await asyncio.to_thread(_find_user, session, form_data.username)
 
-    if not user or not hashing.verify(form_data.password, user.password):
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await hashing.verify_and_update_async(
+            form_data.password, user.password
+        )
+
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if new_hash:
+        user.password = new_hash
+        await asyncio.to_thread(_save, session, user)
+
     token_data = {
         "name": user.name,
         "email": user.email,
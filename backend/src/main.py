@@ -1,24 +1,35 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 
 import src.models
 from .core import init_db, settings
+from .core.executors import shutdown_pools
 from .features import api_router
 from src.features.gpt.gpt_core import ChatbotManager
+from src.features.image_process.jobs_api import create_job_queue
+from src.features.image_process.inference_backends import create_inference_backend
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup operations
     init_db()
+    app.state.inference_backend = create_inference_backend()
+    app.state.job_queue = create_job_queue(app.state.inference_backend)
+    await app.state.job_queue.start()
     chatbot_manager = ChatbotManager()
-    await chatbot_manager.initialize()
     app.state.chatbot_manager = chatbot_manager
+    await chatbot_manager.start()
     print("Chatbot initialized successfully!!")
     yield
     # Shutdown operations
+    await chatbot_manager.shutdown()
+    await app.state.job_queue.shutdown()
+    await app.state.inference_backend.aclose()
+    shutdown_pools()
 
 
 app = FastAPI(
@@ -42,4 +53,11 @@ def get_root():
     return {"Message": "Welcome To TimberGPT"}
 
 
+@app.get("/ready")
+def get_ready():
+    """Readiness Route: 200 once the chatbot can answer, 503 before"""
+    status = app.state.chatbot_manager.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
 app.include_router(api_router, prefix="/api/v1")
@@ -1 +1,2 @@
 from .user_models import User
+from .chat_models import ChatSession
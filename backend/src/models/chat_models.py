@@ -0,0 +1,14 @@
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field
+
+
+# SQLModel ChatSession class
+class ChatSession(SQLModel, table=True):
+    # Primary key
+    session_id: str = Field(primary_key=True, max_length=255)
+
+    # Compact JSON list of [question, answer] turns
+    history: str = Field(default="[]")
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), index=True
+    )
@@ -1,7 +1,17 @@
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 
-# Configure the password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from src.core import settings
+from src.core.executors import get_hashing_pool
+
+# Configure the password hashing context. Hashes made with another cost
+# than `password_hash_rounds` are flagged by `verify_and_update`
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.password_hash_rounds,
+)
 
 
 def hash(password: str) -> str:
@@ -12,3 +22,27 @@ def hash(password: str) -> str:
 def verify(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hashed version."""
     return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and, when its hash is outdated (another cost or
+    scheme), also return a fresh hash to store in its place.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def hash_async(password: str) -> str:
+    """`hash` on the dedicated hashing pool"""
+    return await get_hashing_pool().run(hash, password)
+
+
+async def verify_and_update_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """`verify_and_update` on the dedicated hashing pool"""
+    return await get_hashing_pool().run(
+        verify_and_update, plain_password, hashed_password
+    )
@@ -1,3 +1,9 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 import jwt
 from jwt import PyJWTError, ExpiredSignatureError
 from datetime import datetime, timedelta
@@ -13,6 +19,62 @@ from src.schemas import TokenData
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.api_prefix}/user/login")
 
 
+class TokenCache:
+    """
+    LRU of recently verified access tokens, so a client sending the same
+    token on every request is decoded and checked once. Keyed by the
+    SHA-256 of the token (which covers its signature); an entry is only
+    served until the token's own `exp`, after which it is verified again
+    and rejected as expired.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[TokenData, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[TokenData]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, token_data: TokenData, expires_at: float):
+        with self._lock:
+            self._entries[key] = (token_data, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+token_cache = (
+    TokenCache(settings.token_cache_max_entries)
+    if settings.token_cache_max_entries > 0
+    else None
+)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     expire = datetime.now() + (
@@ -28,6 +90,12 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
 
 
 def verify_access_token(token: str) -> TokenData:
+    if token_cache is not None:
+        key = TokenCache.key(token)
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+
     try:
         payload = jwt.decode(
             token,
@@ -46,6 +114,9 @@ def verify_access_token(token: str) -> TokenData:
                 detail="Token payload missing email",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        # Tokens without `exp` never expire, so they are not cached either
+        if token_cache is not None and "exp" in payload:
+            token_cache.set(key, token_data, payload["exp"])
         return token_data
     except ExpiredSignatureError:
         raise HTTPException(
@@ -61,8 +132,31 @@ def verify_access_token(token: str) -> TokenData:
         )
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
     """
-    Dependency to extract current user info from JWT token.
+    Dependency to extract current user info from JWT token. Verifying an
+    HS256 token (or finding it in the cache) takes microseconds, so this
+    runs on the event loop rather than taking a threadpool thread.
     """
     return verify_access_token(token)
+
+
+async def get_admin_user(
+    current_user: TokenData = Depends(get_current_user),
+) -> TokenData:
+    """
+    Dependency for admin endpoints: the current user must be listed in the
+    ADMIN_EMAILS setting. Registration is open, so being logged in is not
+    enough.
+    """
+    admins = {
+        email.strip().lower()
+        for email in settings.admin_emails.split(",")
+        if email.strip()
+    }
+    if (current_user.email or "").lower() not in admins:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return current_user
@@ -0,0 +1,23 @@
+"""
+Placeholder settings so the tests can import `src` without a real `.env`;
+values already in the environment take precedence.
+"""
+
+import os
+
+_DEFAULTS = {
+    "APP_NAME": "Timber-GPT-test",
+    "DATASET_PATH": "datasets/dataset1.txt",
+    "CHROMA_PERSIST_DIR": "chroma_db",
+    "JWT_SECRET_KEY": "test_secret_key_of_at_least_32_bytes",
+    "SERVER_URL": "http://localhost:8000",
+    "FRONTEND_URL": "http://localhost:3000",
+    "DATABASE_URL": "sqlite://",
+    "OPEN_AI": "unused",
+    "GEMINI_API_KEY": "unused",
+    "ROBOFLOW_API_KEY": "unused",
+    "INFERENCE_CACHE_PATH": "",
+}
+
+for key, value in _DEFAULTS.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.core import settings
+from src.schemas import TokenData
+from src.security import oauth2
+
+
+def test_admin_requires_listed_email(monkeypatch):
+    monkeypatch.setattr(settings, "admin_emails", "Root@Example.com, ops@example.com")
+    admin = TokenData(name="root", email="root@example.com")
+    assert asyncio.run(oauth2.get_admin_user(admin)) is admin
+
+    user = TokenData(name="someone", email="someone@example.com")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(oauth2.get_admin_user(user))
+    assert error.value.status_code == 403
+
+
+def test_no_admins_by_default(monkeypatch):
+    monkeypatch.setattr(settings, "admin_emails", "")
+    user = TokenData(name="someone", email="someone@example.com")
+    with pytest.raises(HTTPException):
+        asyncio.run(oauth2.get_admin_user(user))
@@ -0,0 +1,61 @@
+import pytest
+
+from src.features.gpt.gpt_chain import is_small_talk, needs_condensing
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "hi",
+        "Hello there!",
+        "thanks a lot",
+        "I am Sam",
+        "I'm Rahim Uddin",
+        "my name is John Smith",
+    ],
+)
+def test_small_talk(question):
+    assert is_small_talk(question)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "I am looking for teak prices",
+        "I'm building a deck, which wood is best?",
+        "I am Sam?",
+        "I need help",
+        "I am interested in mahogany",
+        "my name is Sam, what is sal?",
+        "What is teak?",
+    ],
+)
+def test_questions_are_not_small_talk(question):
+    assert not is_small_talk(question)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "What is the price?",
+        "How long does it last?",
+        "and oak?",
+        "What about the seasoning time for those?",
+        "Which one is cheaper in the market today?",
+    ],
+)
+def test_follow_ups_are_condensed(question):
+    assert needs_condensing(question)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "hello",
+        "What is the density of teak?",
+        "How is sal timber seasoned in kilns?",
+        "Where does Sundarbans timber come from?",
+    ],
+)
+def test_self_contained_questions_are_not_condensed(question):
+    assert not needs_condensing(question)
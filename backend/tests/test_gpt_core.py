@@ -0,0 +1,21 @@
+import asyncio
+import logging
+
+from src.features.gpt.gpt_core import ChatbotManager
+
+
+def test_background_sync_failure_is_logged(caplog):
+    manager = ChatbotManager()
+
+    async def failing_reindex():
+        raise RuntimeError("embedding API down")
+
+    manager.reindex = failing_reindex
+    with caplog.at_level(logging.ERROR, logger="src.features.gpt.gpt_core"):
+        asyncio.run(manager._background_sync())
+
+    assert not manager.ready
+    assert manager.index_error == "embedding API down"
+    [record] = caplog.records
+    assert record.message == "Background index sync failed"
+    assert record.exc_info[0] is RuntimeError
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+from src.core import settings
+from src.features.gpt.gpt_ingest import IngestionPipeline
+
+
+class FakeCollection:
+    def __init__(self, store):
+        self.store = store
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.store.calls.append(threading.current_thread())
+        self.store.ids.update(ids)
+        self.store.upserted.extend(ids)
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.ids = set()
+        self.calls = []
+        self.upserted = []
+        self._collection = FakeCollection(self)
+
+    def get(self, include):
+        self.calls.append(threading.current_thread())
+        return {"ids": sorted(self.ids)}
+
+    def delete(self, ids):
+        self.calls.append(threading.current_thread())
+        self.ids.difference_update(ids)
+
+
+class FakeEmbeddings:
+    async def aembed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+def _pipeline(tmp_path, monkeypatch, vectordb):
+    monkeypatch.setattr(settings, "chroma_persist_dir", str(tmp_path / "chroma"))
+    return IngestionPipeline(
+        vectordb,
+        FakeEmbeddings(),
+        dataset_path=str(tmp_path / "data"),
+        batch_size=2,
+        progress=lambda message: None,
+    )
+
+
+def test_incremental_sync(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("teak is durable. " * 200, encoding="utf-8")
+    (data / "b.md").write_text("sal grows in Bangladesh.", encoding="utf-8")
+    vectordb = FakeVectorStore()
+    pipeline = _pipeline(tmp_path, monkeypatch, vectordb)
+
+    first = asyncio.run(pipeline.run())
+    assert first.files_scanned == 2
+    assert first.chunks_added == len(vectordb.ids) > 1
+
+    second = asyncio.run(pipeline.run())
+    assert second.chunks_added == 0
+    assert not second.changed
+
+    (data / "b.md").unlink()
+    third = asyncio.run(pipeline.run())
+    assert third.removed_files == [str(data / "b.md")]
+    assert third.chunks_deleted == 1
+
+
+def test_new_embedding_model_re_embeds_every_chunk(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("teak is durable. " * 200, encoding="utf-8")
+    vectordb = FakeVectorStore()
+    pipeline = _pipeline(tmp_path, monkeypatch, vectordb)
+    first = asyncio.run(pipeline.run())
+
+    monkeypatch.setattr(settings, "embedding_model", "another-embedding-model")
+    vectordb.upserted.clear()
+    second = asyncio.run(pipeline.run())
+    assert second.chunks_added == first.chunks_added
+    assert sorted(vectordb.upserted) == sorted(vectordb.ids)
+
+    vectordb.upserted.clear()
+    assert asyncio.run(pipeline.run()).chunks_added == 0
+    full = asyncio.run(pipeline.run(full=True))
+    assert full.chunks_added == first.chunks_added
+    assert sorted(vectordb.upserted) == sorted(vectordb.ids)
+
+
+def test_store_calls_run_off_the_event_loop(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("mahogany " * 300, encoding="utf-8")
+    vectordb = FakeVectorStore()
+    pipeline = _pipeline(tmp_path, monkeypatch, vectordb)
+
+    async def run():
+        loop_thread = threading.current_thread()
+        await pipeline.run()
+        return loop_thread
+
+    loop_thread = asyncio.run(run())
+    assert vectordb.calls
+    assert loop_thread not in vectordb.calls
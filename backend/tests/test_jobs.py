@@ -0,0 +1,87 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from src.core.concurrency import QueueFullError
+from src.features.image_process.artifacts import ArtifactStore
+from src.features.image_process.jobs import (
+    CallbackURLError,
+    JobQueue,
+    check_callback_url,
+)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://127.0.0.1:8000/hook",
+        "http://localhost/hook",
+        "http://10.0.0.5/hook",
+        "http://192.168.1.1/hook",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://[::1]/hook",
+        "http://[::ffff:127.0.0.1]/hook",
+        "http://0.0.0.0/hook",
+        "ftp://8.8.8.8/hook",
+    ],
+)
+def test_callback_to_internal_address_is_refused(url):
+    with pytest.raises(CallbackURLError):
+        asyncio.run(check_callback_url(url))
+
+
+def test_callback_to_public_address_is_allowed():
+    asyncio.run(check_callback_url("https://8.8.8.8/hook"))
+
+
+def test_callback_allowlist():
+    allowed = ("hooks.example.com",)
+    asyncio.run(check_callback_url("https://hooks.example.com/x", allowed))
+    with pytest.raises(CallbackURLError):
+        asyncio.run(check_callback_url("https://8.8.8.8/hook", allowed))
+
+
+def test_queue_is_bounded_by_queued_bytes():
+    async def handler(image_bytes, filename, params):
+        return {}, {}
+
+    queue = JobQueue(
+        {"analyze": handler},
+        workers=1,
+        max_queue=100,
+        ttl_seconds=60,
+        max_queued_bytes=1000,
+    )
+    queue.submit("analyze", b"x" * 600, "a.jpg", {}, "http://test/")
+    with pytest.raises(QueueFullError):
+        queue.submit("analyze", b"x" * 600, "b.jpg", {}, "http://test/")
+    assert queue.queued_bytes == 600
+
+
+def test_artifact_ttl_per_put(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl_seconds=600)
+    short = store.put(b"png", "png", ttl_seconds=-1)
+    default = store.put(b"png", "png")
+    long = store.put(b"png", "png", ttl_seconds=3600)
+
+    assert store.get(short) is None
+    assert store.get(default) is not None
+    path, _ = store.get(long)
+    assert path.stat().st_mtime > time.time() + 3000
+    assert store.sweep() == 0
+
+
+def test_sweep_spares_writes_in_progress(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl_seconds=600)
+    in_progress = tmp_path / ".in-progress.png.tmp"
+    in_progress.write_bytes(b"png")
+    crashed = tmp_path / ".crashed.png.tmp"
+    crashed.write_bytes(b"png")
+    old = time.time() - 2 * 3600
+    os.utime(crashed, (old, old))
+
+    assert store.sweep() == 1
+    assert in_progress.exists()
+    assert not crashed.exists()
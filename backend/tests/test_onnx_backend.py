@@ -0,0 +1,244 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from src.core.executors import WorkerPool
+from src.features.image_process.onnx_backend import (
+    LETTERBOX_FILL,
+    MicroBatcher,
+    OnnxBackend,
+    decode_yolo,
+    letterbox,
+    ort,
+)
+
+INPUT = (64, 64)
+IMAGE_SIZE = (200, 100)  # (w, h) of the original image
+
+
+def _box(image_box, size=IMAGE_SIZE, input_size=INPUT):
+    """An original-image (cx, cy, w, h) box in letterboxed input pixels"""
+    image = np.zeros((size[1], size[0], 3), np.uint8)
+    _, (gain, pad_x, pad_y) = letterbox(image, input_size)
+    cx, cy, w, h = image_box
+    return [cx * gain + pad_x, cy * gain + pad_y, w * gain, h * gain]
+
+
+def _outputs(rows, n_classes, protos=None):
+    """YOLO export output of one image: one column per candidate"""
+    return [np.array(rows, np.float32).T] + ([protos] if protos is not None else [])
+
+
+def _decode(outputs, confidence=0.4, iou=0.3):
+    image = np.zeros((IMAGE_SIZE[1], IMAGE_SIZE[0], 3), np.uint8)
+    _, box = letterbox(image, INPUT)
+    return decode_yolo(
+        outputs, box, INPUT, IMAGE_SIZE, {0: "log", 1: "bark"}, confidence, iou
+    )
+
+
+def test_letterbox_pads_and_keeps_aspect():
+    image = np.zeros((100, 200, 3), np.uint8)
+    image[50:70, 140:160] = (0, 0, 255)  # red block, BGR
+    tensor, (gain, pad_x, pad_y) = letterbox(image, INPUT)
+
+    assert tensor.shape == (3, 64, 64) and tensor.dtype == np.float32
+    assert gain == pytest.approx(0.32) and pad_x == 0 and pad_y == 16
+    assert tensor[:, 0, 0] == pytest.approx([LETTERBOX_FILL / 255] * 3)
+    # RGB order, and the block's center lands at original * gain + pad
+    y, x = round(60 * gain + pad_y), round(150 * gain + pad_x)
+    assert tensor[:, y, x] == pytest.approx([1.0, 0.0, 0.0])
+
+
+def test_box_coordinates_round_trip():
+    rows = [_box((120, 40, 50, 30)) + [0.9, 0.05]]
+    (pred,) = _decode(_outputs(rows, 2))
+    assert (pred["x"], pred["y"]) == pytest.approx((120, 40), abs=1e-3)
+    assert (pred["width"], pred["height"]) == pytest.approx((50, 30), abs=1e-3)
+    assert pred["class"] == "log" and pred["confidence"] == pytest.approx(0.9)
+
+
+def test_nms_keeps_best_of_overlapping_boxes_per_class():
+    rows = [
+        _box((100, 50, 60, 40)) + [0.9, 0.0],
+        _box((102, 51, 60, 40)) + [0.7, 0.0],  # duplicate of the first
+        _box((101, 50, 60, 40)) + [0.0, 0.8],  # same place, other class
+        _box((30, 30, 20, 20)) + [0.2, 0.1],  # below the confidence
+    ]
+    preds = _decode(_outputs(rows, 2))
+    assert sorted((p["class"], p["confidence"]) for p in preds) == [
+        ("bark", pytest.approx(0.8)),
+        ("log", pytest.approx(0.9)),
+    ]
+
+
+def test_mask_outline_maps_to_original_pixels():
+    # One mask coefficient; the prototype is positive on a square that the
+    # box covers, at a quarter of the input resolution
+    protos = np.full((1, 16, 16), -5, np.float32)
+    protos[0, 6:10, 4:8] = 5  # input pixels x 16..32, y 24..40
+    gain, pad_x, pad_y = 0.32, 0.0, 16.0
+    box = [24, 32, 24, 24]  # input cx, cy, w, h around the square
+    preds = _decode(_outputs([box + [0.9, 0.0, 1.0]], 2, protos))
+
+    (pred,) = preds
+    xs = [p["x"] for p in pred["points"]]
+    ys = [p["y"] for p in pred["points"]]
+    assert min(xs) == pytest.approx((16 - pad_x) / gain, abs=8)
+    assert max(xs) == pytest.approx((32 - pad_x) / gain, abs=8)
+    assert min(ys) == pytest.approx((24 - pad_y) / gain, abs=8)
+    assert max(ys) == pytest.approx((40 - pad_y) / gain, abs=8)
+
+
+class _RecordingModel:
+    def __init__(self, max_batch):
+        self.max_batch = max_batch
+        self.batches = []
+
+    def run(self, batch):
+        self.batches.append(len(batch))
+        return [[tensor.sum(keepdims=True)] for tensor in batch]
+
+
+def test_micro_batcher_groups_concurrent_submissions():
+    model = _RecordingModel(max_batch=4)
+    runner = WorkerPool("test-onnx", "thread", 1)
+
+    async def run():
+        batcher = MicroBatcher(model, runner, wait_seconds=0.05)
+        tensors = [np.full((1, 2, 2), i, np.float32) for i in range(6)]
+        results = await asyncio.gather(*(batcher.submit(t) for t in tensors))
+        return batcher, results
+
+    try:
+        batcher, results = asyncio.run(run())
+    finally:
+        runner.shutdown()
+    assert sorted(model.batches) == [2, 4]
+    assert batcher.runs == 2 and batcher.images == 6
+    # Each caller gets the output of its own tensor
+    assert [r[0].item() for r in results] == [4.0 * i for i in range(6)]
+
+
+needs_ort = pytest.mark.skipif(ort is None, reason="onnxruntime not installed")
+
+
+@needs_ort
+def test_missing_export_is_503(tmp_path):
+    backend = OnnxBackend(str(tmp_path))
+    try:
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(backend.predict("wood_segment/17", upload=None))
+    finally:
+        asyncio.run(backend.aclose())
+    assert error.value.status_code == 503
+
+
+def _constant_model(path, outputs, imgsz=64, names=None):
+    """
+    Tiny stand-in export: returns fixed `outputs` for every image of the
+    input batch, like a YOLO export would return its raw predictions
+    """
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    inits = [
+        numpy_helper.from_array(np.array([0], np.int64), "s0"),
+        numpy_helper.from_array(np.array([1], np.int64), "s1"),
+        numpy_helper.from_array(np.array([1, 2, 3], np.int64), "axes"),
+        numpy_helper.from_array(np.array(0, np.float32), "zero"),
+    ]
+    nodes = [
+        helper.make_node("Shape", ["images"], ["shape"]),
+        helper.make_node("Slice", ["shape", "s0", "s1"], ["n"]),
+        helper.make_node("ReduceMean", ["images", "axes"], ["mean"], keepdims=0),
+        helper.make_node("Mul", ["mean", "zero"], ["z"]),
+    ]
+    outs = []
+    for i, const in enumerate(outputs):
+        const = const.astype(np.float32)[None]
+        inits += [
+            numpy_helper.from_array(const, f"c{i}"),
+            numpy_helper.from_array(np.array(const.shape[1:], np.int64), f"rest{i}"),
+            numpy_helper.from_array(
+                np.array([-1] + [1] * (const.ndim - 1), np.int64), f"zshape{i}"
+            ),
+        ]
+        nodes += [
+            helper.make_node("Concat", ["n", f"rest{i}"], [f"full{i}"], axis=0),
+            helper.make_node("Expand", [f"c{i}", f"full{i}"], [f"e{i}"]),
+            helper.make_node("Reshape", ["z", f"zshape{i}"], [f"zr{i}"]),
+            helper.make_node("Add", [f"e{i}", f"zr{i}"], [f"output{i}"]),
+        ]
+        outs.append(
+            helper.make_tensor_value_info(
+                f"output{i}", TensorProto.FLOAT, ["N"] + list(const.shape[1:])
+            )
+        )
+    images = helper.make_tensor_value_info(
+        "images", TensorProto.FLOAT, ["N", 3, imgsz, imgsz]
+    )
+    graph = helper.make_graph(nodes, "stand_in", [images], outs, inits)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 18)])
+    model.ir_version = 9
+    for key, value in {"names": str(names or {}), "imgsz": str([imgsz] * 2)}.items():
+        entry = model.metadata_props.add()
+        entry.key, entry.value = key, value
+    path.parent.mkdir(parents=True, exist_ok=True)
+    onnx.save(model, str(path))
+
+
+@needs_ort
+def test_stand_in_export_end_to_end(tmp_path, monkeypatch):
+    from src.core.config import settings
+
+    monkeypatch.setattr(settings, "onnx_batch_wait_ms", 20.0)
+    rows = np.array([_box((120, 40, 50, 30)) + [0.9, 0.05]], np.float32).T
+    _constant_model(tmp_path / "wood_segment" / "17.onnx", [rows], names={0: "log"})
+    image = np.zeros((IMAGE_SIZE[1], IMAGE_SIZE[0], 3), np.uint8)
+
+    class Upload:
+        async def image(self):
+            return image
+
+    backend = OnnxBackend(str(tmp_path))
+
+    async def run():
+        return await asyncio.gather(
+            *(backend.predict("wood_segment/17", Upload()) for _ in range(3))
+        )
+
+    try:
+        responses = asyncio.run(run())
+        stats = backend.stats()["models"]["wood_segment/17"]
+    finally:
+        asyncio.run(backend.aclose())
+
+    for response in responses:
+        (pred,) = response["predictions"]
+        assert pred["class"] == "log"
+        assert (pred["x"], pred["y"]) == pytest.approx((120, 40), abs=1e-3)
+    assert stats["images"] == 3 and stats["runs"] == 1
+
+
+@needs_ort
+def test_cache_variant_follows_export_and_thresholds(tmp_path, monkeypatch):
+    from src.core.config import settings
+
+    path = tmp_path / "m" / "1.onnx"
+    path.parent.mkdir()
+    path.write_bytes(b"v1")
+    backend = OnnxBackend(str(tmp_path))
+    try:
+        first = backend.variant("m/1", upload=None)
+        path.write_bytes(b"v2 longer")
+        assert backend.variant("m/1", upload=None) != first
+
+        second = backend.variant("m/1", upload=None)
+        monkeypatch.setattr(settings, "onnx_confidence", 0.25)
+        assert OnnxBackend(str(tmp_path)).variant("m/1", upload=None) != second
+    finally:
+        asyncio.run(backend.aclose())
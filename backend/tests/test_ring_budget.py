@@ -0,0 +1,39 @@
+import struct
+import zlib
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from src.core import settings
+from src.features.image_process.ring_count_api import (
+    RING_BYTES_PER_PIXEL,
+    check_ring_budget,
+    ring_working_bytes,
+)
+
+
+def _png_header(width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    crc = struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr + crc
+
+
+def test_working_set_estimate_from_header():
+    data = cv2.imencode(".jpg", np.zeros((300, 400, 3), np.uint8))[1].tobytes()
+    assert ring_working_bytes(data) == 400 * 300 * RING_BYTES_PER_PIXEL + len(data)
+    assert ring_working_bytes(b"not an image") is None
+
+
+def test_over_budget_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "ring_max_working_bytes", 64 * 1024 * 1024)
+    check_ring_budget(_png_header(4000, 3000))  # ~46 MiB
+    with pytest.raises(HTTPException) as error:
+        check_ring_budget(_png_header(8000, 6000))  # ~183 MiB
+    assert error.value.status_code == 413
+
+
+def test_budget_off(monkeypatch):
+    monkeypatch.setattr(settings, "ring_max_working_bytes", 0)
+    check_ring_budget(_png_header(20000, 20000))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from scipy.signal import find_peaks
+
+from src.features.image_process.ring_count_core import count_rings
+
+
+def _find_peaks_counts(polar_edges, line_indices, distance=None):
+    """The original per-line loop"""
+    return [
+        len(find_peaks((polar_edges[y] > 0).astype(np.uint8), distance=distance)[0])
+        for y in line_indices
+    ]
+
+
+@pytest.mark.parametrize("density", [0.0, 0.05, 0.3, 1.0])
+@pytest.mark.parametrize("rays", [20, 360, 0])
+def test_counts_match_find_peaks(density, rays):
+    rng = np.random.default_rng(0)
+    polar = (rng.random((720, 400)) < density).astype(np.uint8) * 255
+    line_indices, counts, (run_rows, centers) = count_rings(polar, rays, min_distance=1)
+    assert counts == _find_peaks_counts(polar, line_indices)
+    assert len(run_rows) == len(centers) == sum(counts)
+    assert np.all(polar[line_indices[run_rows], centers] > 0)
+
+
+@pytest.mark.parametrize("density", [0.05, 0.1, 0.3, 0.6])
+def test_merged_counts_match_find_peaks_distance(density):
+    rng = np.random.default_rng(1)
+    polar = (rng.random((720, 400)) < density).astype(np.uint8) * 255
+    line_indices, counts, (run_rows, centers) = count_rings(polar, 360, min_distance=5)
+    assert counts == _find_peaks_counts(polar, line_indices, distance=5)
+    assert len(run_rows) == sum(counts)
+
+
+def test_chain_of_close_runs_keeps_every_other():
+    polar = np.zeros((1, 12), np.uint8)
+    polar[0, [2, 5, 8]] = 255  # 5 is within 5 of 2, 8 is not
+    _, counts, (_, centers) = count_rings(polar, 0)
+    assert counts == [2]
+    assert centers.tolist() == [2, 8]
+
+
+def test_border_runs_are_not_crossings():
+    polar = np.zeros((4, 12), np.uint8)
+    polar[0, :3] = 255  # touches the inner border
+    polar[1, -2:] = 255  # touches the outer border
+    polar[2, 4:7] = 255
+    polar[3, 2] = polar[3, 4] = polar[3, 9] = 255  # 2 and 4 merge
+    _, counts, (run_rows, centers) = count_rings(polar, 0)
+    assert counts == [0, 0, 1, 2]
+    assert run_rows.tolist() == [2, 3, 3]
+    assert centers.tolist() == [5, 2, 9]
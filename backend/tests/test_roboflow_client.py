@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.features.image_process import roboflow_client
+from src.features.image_process.roboflow_client import RoboflowClient
+
+
+def _client(monkeypatch, responses):
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(roboflow_client.asyncio, "sleep", fake_sleep)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        response = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client = RoboflowClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client.max_retries = 2
+    client.backoff_seconds = 0.5
+    client.max_backoff_seconds = 10.0
+    client.timeout_seconds = 30.0
+    return client, calls, sleeps
+
+
+def _post(client):
+    async def run():
+        try:
+            return await client.post("https://roboflow.test/model/1")
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_retry_after_is_capped(monkeypatch):
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "20"}),
+        httpx.Response(200, json={"predictions": []}),
+    ]
+    client, calls, sleeps = _client(monkeypatch, responses)
+    assert _post(client).status_code == 200
+    assert sleeps == [10.0] and len(calls) == 2
+
+
+def test_retry_after_beyond_the_timeout_gives_up(monkeypatch):
+    responses = [httpx.Response(429, headers={"Retry-After": "3600"})]
+    client, calls, sleeps = _client(monkeypatch, responses)
+    assert _post(client).status_code == 429
+    assert sleeps == [] and len(calls) == 1
+
+
+def test_exponential_backoff_is_capped(monkeypatch):
+    responses = [httpx.Response(503)]
+    client, calls, sleeps = _client(monkeypatch, responses)
+    client.backoff_seconds = 8.0
+    assert _post(client).status_code == 503
+    assert len(calls) == 3
+    assert sleeps[0] == pytest.approx(8.0, abs=4.0) and sleeps[1] == 10.0
+
+
+def test_connect_errors_are_retried(monkeypatch):
+    responses = [httpx.ConnectError("refused"), httpx.Response(200)]
+    client, calls, sleeps = _client(monkeypatch, responses)
+    assert _post(client).status_code == 200
+    assert len(calls) == 2 and len(sleeps) == 1
+
+
+@pytest.mark.parametrize("error", [httpx.ReadTimeout, httpx.WriteTimeout])
+def test_timeouts_are_not_retried(monkeypatch, error):
+    client, calls, sleeps = _client(monkeypatch, [error("slow")])
+    with pytest.raises(error):
+        _post(client)
+    assert len(calls) == 1 and sleeps == []
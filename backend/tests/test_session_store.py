@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+from sqlmodel import SQLModel, create_engine
+
+from src.features.gpt.gpt_memory import (
+    InMemorySessionStore,
+    SessionStore,
+    SQLSessionStore,
+    TieredSessionStore,
+)
+from src.models import ChatSession  # noqa: F401
+
+
+def _sql_store(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    SQLModel.metadata.create_all(engine)
+    return SQLSessionStore(engine, idle_ttl_seconds=3600)
+
+
+def _memory_store():
+    return InMemorySessionStore(100, 1_000_000, 3600)
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_append_trims_to_window_and_size(tmp_path):
+    for store in (_memory_store(), _sql_store(tmp_path)):
+        for i in range(5):
+            turns = store.append("s", (f"q{i}", "a"), window_k=3, max_chars=100)
+        assert turns == [("q2", "a"), ("q3", "a"), ("q4", "a")]
+        assert store.get("s") == turns
+
+        turns = store.append("s", ("q" * 95, "a"), window_k=3, max_chars=100)
+        assert turns == [("q4", "a"), ("q" * 95, "a")]
+
+
+@pytest.mark.parametrize("tiered", [False, True])
+def test_concurrent_appends_keep_every_turn(tmp_path, tiered):
+    store = _sql_store(tmp_path)
+    if tiered:
+        store = TieredSessionStore(_memory_store(), store, fresh_seconds=5)
+    workers, turns_each = 4, 10
+    start = threading.Barrier(workers)
+
+    def worker(w):
+        start.wait()
+        for i in range(turns_each):
+            store.append("shared", (f"{w}-{i}", "a"), window_k=1000, max_chars=10**6)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    durable = store.durable if tiered else store
+    questions = [question for question, _ in durable.get("shared")]
+    assert sorted(questions) == sorted(
+        f"{w}-{i}" for w in range(workers) for i in range(turns_each)
+    )
+
+
+def test_tiered_store_is_thread_safe():
+    durable = InMemorySessionStore(10_000, 10**8, 3600)
+    store = TieredSessionStore(
+        InMemorySessionStore(8, 10**6, 3600), durable, fresh_seconds=5
+    )
+    errors = []
+
+    def worker(w):
+        try:
+            for i in range(300):
+                session_id = f"{w}-{i % 50}"
+                store.append(session_id, ("q", "a"), window_k=5, max_chars=1000)
+                store.get(session_id)
+                if i % 7 == 0:
+                    store.delete(session_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(store._loaded_at) <= 2 * store.memory.max_sessions + 1